@@ -0,0 +1,4 @@
+"""
+Бенчмарки RAG-сервиса. Запускаются из корня репозитория, например:
+    python -m benchmarks.prefork_benchmark
+"""
@@ -0,0 +1,97 @@
+"""
+Генератор синтетического корпуса в стиле русской Википедии.
+
+Записи имеют тот же формат, что и данные для индексации: `uid`, `ru_wiki_pageid`
+и `text`. Одна статья состоит из нескольких абзацев, длина абзаца в среднем
+около 450 символов, в часть текстов подмешиваются управляющие и невидимые символы,
+найденные при анализе исходных данных.
+"""
+import random
+from typing import Any, Dict, List
+
+WORDS = (
+    "год году года город область район река история население страна клуб команда сезон "
+    "чемпионат матч игрок тренер победа поражение война армия империя князь царь император "
+    "губерния уезд село деревня церковь храм монастырь собор улица площадь музей театр "
+    "университет институт школа учёный писатель поэт художник композитор актёр режиссёр "
+    "фильм роман книга журнал газета издание премия орден медаль звание генерал полковник "
+    "министр президент правительство парламент партия выборы закон реформа экономика "
+    "промышленность завод фабрика железная дорога станция порт аэропорт мост канал озеро "
+    "море остров гора хребет лес степь климат температура осадки зима лето весна осень "
+    "вид род семейство растение животное птица рыба насекомое длина ширина высота площадь "
+    "метров километров человек жителей тысяч миллионов впервые также является был была были "
+    "стал стала основан построен назван переименован расположен находится входит известен "
+    "в на по из с к от для при после до около между во время согласно однако кроме того"
+).split()
+CAPITALS = (
+    "Москва Санкт-Петербург Россия СССР Европа Азия Волга Кавказ Сибирь Урал Крым Киев "
+    "Минск Казань Новгород Петров Иванов Смирнов Кузнецов Попов Соколов Лебедев Козлов "
+    "Новиков Морозов Александр Сергей Николай Пётр Иван Михаил Екатерина Анна Мария"
+).split()
+NOISE_CHARS = ("​", "\xad", "﻿", "‎", "\t", "‍")
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(6, 18))]
+    for _ in range(rng.randint(0, 3)):
+        words.insert(rng.randrange(len(words)), rng.choice(CAPITALS))
+    if rng.random() < 0.4:
+        words.insert(rng.randrange(len(words)), str(rng.randint(1700, 2023)))
+    sentence = " ".join(words)
+    return sentence[0].upper() + sentence[1:] + "."
+
+
+def _paragraph(rng: random.Random, noise: float) -> str:
+    target = max(30, int(rng.gauss(450, 200)))
+    sentences = []
+    length = 0
+    while length < target:
+        sentence = _sentence(rng)
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    text = " ".join(sentences)
+    if rng.random() < noise:
+        position = rng.randrange(len(text))
+        text = text[:position] + rng.choice(NOISE_CHARS) + text[position:]
+    return text
+
+
+def generate_corpus(
+        documents: int,
+        paragraphs_per_page: int = 4,
+        noise: float = 0.1,
+        near_duplicates: float = 0.0,
+        seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Генерирует синтетический корпус абзацев.
+    Args:
+        documents: int - общее количество абзацев (записей).
+        paragraphs_per_page: int - среднее количество абзацев в одной статье.
+        noise: float - доля абзацев, в которые добавляется невидимый символ.
+        near_duplicates: float - доля абзацев, которые являются копиями ранее
+                         сгенерированных абзацев (с другой страницы) с заменой одного слова.
+        seed: int - зерно генератора случайных чисел.
+    Returns:
+        Список словарей с ключами "uid", "ru_wiki_pageid" и "text".
+    """
+    rng = random.Random(seed)
+    corpus = []
+    page_id = 1000
+    while len(corpus) < documents:
+        page_id += rng.randint(1, 50)
+        for _ in range(max(1, int(rng.expovariate(1 / paragraphs_per_page)))):
+            if len(corpus) >= documents:
+                break
+            if corpus and rng.random() < near_duplicates:
+                words = rng.choice(corpus)["text"].split()
+                words[rng.randrange(len(words))] = rng.choice(WORDS)
+                text = " ".join(words)
+            else:
+                text = _paragraph(rng, noise)
+            corpus.append({
+                "uid": len(corpus),
+                "ru_wiki_pageid": page_id,
+                "text": text,
+            })
+    return corpus
@@ -0,0 +1,46 @@
+"""
+Отчет о количестве почти одинаковых чанков, удаляемых при разных порогах.
+
+Данные берутся из JSON-файла в формате индексации или генерируются
+(benchmarks.corpus) с заданной долей почти дубликатов, затем проходят очистку и
+разбиение на чанки так же, как в сервисе индексации.
+
+Пример:
+    python -m benchmarks.dedup_report --input data.json
+    python -m benchmarks.dedup_report --documents 5000 --near-duplicates 0.1
+"""
+import argparse
+import json
+import time
+
+from benchmarks.corpus import generate_corpus
+from indexing_service.utils.dedup import dedup_report
+from indexing_service.utils.preprocessor import chunker, clean_and_normalize_text
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Near-duplicate chunk report")
+    parser.add_argument("--input", default="", help="JSON file with indexing data")
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--near-duplicates", type=float, default=0.1)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.7, 0.8, 0.9, 0.95])
+    parser.add_argument("--num-perm", type=int, default=128)
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, encoding="utf-8") as f:
+            data = json.load(f)
+    else:
+        data = generate_corpus(args.documents, near_duplicates=args.near_duplicates)
+    chunks = chunker(clean_and_normalize_text(data))
+    start = time.perf_counter()
+    report = dedup_report(chunks, args.thresholds, args.num_perm)
+    elapsed = time.perf_counter() - start
+    print(f"Chunks: {len(chunks)}, report computed in {elapsed:.2f} s")
+    for threshold, dropped in report.items():
+        print(f"threshold {threshold:.2f}: dropped {dropped} ({dropped / max(1, len(chunks)):.1%}), "
+              f"kept {len(chunks) - dropped}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""
+Нагрузочный генератор для "/search/" и "/indexing/" бэкенда (src/backend.py).
+
+Поддерживает закрытую модель нагрузки (фиксированное число конкурентных клиентов)
+и открытую (пуассоновский поток запросов с заданной интенсивностью), настраиваемую
+смесь запросов и автоматический поиск точки насыщения. С флагом --stub бэкенд
+запускается локально, а сервисы поиска и индексации заменяются заглушками с
+настраиваемой задержкой (benchmarks.stub_services), что позволяет профилировать
+бэкенд и межсервисное взаимодействие изолированно.
+
+Примеры:
+    python -m benchmarks.loadgen --stub --concurrency 32 --duration 30
+    python -m benchmarks.loadgen --stub --rate 50 --mix search=0.9 indexing=0.1
+    python -m benchmarks.loadgen --stub --find-saturation --slo-ms 1000
+    python -m benchmarks.loadgen --target http://localhost:8001 --concurrency 4
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = {"search": "/search/", "indexing": "/indexing/"}
+QUERIES = [
+    "Что такое машинное обучение?",
+    "Когда был основан ЦСКА?",
+    "Какой город расположен на реке Волга?",
+    "Кто написал роман «Война и мир»?",
+    "Есть ли в базе информация о Беларуси?",
+]
+
+Sample = Tuple[str, float, bool, str]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Вычисляет перцентиль методом ближайшего ранга.
+    Args:
+        values: List[float] - значения.
+        q: float - перцентиль от 0 до 100.
+    Returns:
+        float: Значение перцентиля или 0.0 для пустого списка.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def parse_mix(items: List[str]) -> Dict[str, float]:
+    """
+    Разбирает смесь запросов вида ["search=0.9", "indexing=0.1"] и нормирует веса.
+    """
+    mix = {}
+    for item in items:
+        name, _, weight = item.partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}', expected one of {sorted(ENDPOINTS)}")
+        mix[name] = float(weight or 1)
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError("Request mix weights must be positive")
+    return {name: weight / total for name, weight in mix.items()}
+
+
+def summarize(samples: List[Sample], duration: float) -> Dict[str, Any]:
+    """
+    Считает пропускную способность, перцентили задержки и долю ошибок.
+    Args:
+        samples: список (endpoint, задержка в секундах, успех, описание ошибки).
+        duration: float - длительность прогона в секундах.
+    Returns:
+        Dict[str, Any]: Общая статистика и статистика по каждому endpoint.
+    """
+    def stats(group: List[Sample]) -> Dict[str, Any]:
+        latencies = [s[1] * 1000 for s in group if s[2]]
+        errors: Dict[str, int] = {}
+        for s in group:
+            if not s[2]:
+                errors[s[3]] = errors.get(s[3], 0) + 1
+        return {
+            "requests": len(group),
+            "throughput_rps": round(len(latencies) / duration, 2) if duration else 0.0,
+            "error_rate": round((len(group) - len(latencies)) / len(group), 4) if group else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+            "errors": errors,
+        }
+
+    report = stats(samples)
+    report["endpoints"] = {
+        name: stats([s for s in samples if s[0] == name])
+        for name in sorted({s[0] for s in samples})
+    }
+    return report
+
+
+class LoadGenerator:
+    """
+    Отправляет запросы к бэкенду и собирает задержки.
+    """
+    def __init__(
+            self,
+            base_url: str,
+            mix: Dict[str, float],
+            index_url: str,
+            timeout: float = 30.0,
+            seed: int = 0,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.mix = mix
+        self.index_url = index_url
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+
+    def _next_request(self) -> Tuple[str, Dict[str, str]]:
+        endpoint = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        if endpoint == "search":
+            return endpoint, {"query": self.rng.choice(QUERIES)}
+        return endpoint, {"url": self.index_url}
+
+    async def _send(self, client: httpx.AsyncClient) -> Sample:
+        endpoint, body = self._next_request()
+        start = time.perf_counter()
+        try:
+            response = await client.post(self.base_url + ENDPOINTS[endpoint], json=body)
+            ok = response.status_code == 200 and response.json().get("status") == "success"
+            error = "" if ok else f"HTTP {response.status_code}"
+        except (httpx.HTTPError, ValueError) as e:
+            ok, error = False, type(e).__name__
+        return endpoint, time.perf_counter() - start, ok, error
+
+    def _client(self, connections: int) -> httpx.AsyncClient:
+        limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+        return httpx.AsyncClient(timeout=self.timeout, limits=limits)
+
+    async def closed_loop(self, concurrency: int, duration: float) -> List[Sample]:
+        """
+        Закрытая модель: concurrency клиентов отправляют запросы один за другим.
+        """
+        samples: List[Sample] = []
+        stop_at = time.perf_counter() + duration
+        async with self._client(concurrency) as client:
+            async def worker() -> None:
+                while time.perf_counter() < stop_at:
+                    samples.append(await self._send(client))
+            await asyncio.gather(*[worker() for _ in range(concurrency)])
+        return samples
+
+    async def open_loop(self, rate: float, duration: float, max_in_flight: int = 1000) -> List[Sample]:
+        """
+        Открытая модель: запросы поступают пуассоновским потоком с интенсивностью rate
+        запросов в секунду независимо от времени ответа. Запросы сверх max_in_flight
+        не отправляются и учитываются как ошибки "client_overload".
+        """
+        samples: List[Sample] = []
+        tasks = []
+        in_flight = 0
+        async with self._client(max_in_flight) as client:
+            async def fire() -> None:
+                nonlocal in_flight
+                in_flight += 1
+                try:
+                    samples.append(await self._send(client))
+                finally:
+                    in_flight -= 1
+
+            start = time.perf_counter()
+            next_arrival = start
+            while next_arrival < start + duration:
+                await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+                if in_flight >= max_in_flight:
+                    samples.append(("overload", 0.0, False, "client_overload"))
+                else:
+                    tasks.append(asyncio.ensure_future(fire()))
+                next_arrival += self.rng.expovariate(rate)
+            await asyncio.gather(*tasks)
+        return samples
+
+    def run(self, duration: float, concurrency: int = 0, rate: float = 0.0) -> Dict[str, Any]:
+        """
+        Выполняет один прогон и возвращает сводную статистику.
+        """
+        start = time.perf_counter()
+        if rate > 0:
+            samples = asyncio.run(self.open_loop(rate, duration))
+        else:
+            samples = asyncio.run(self.closed_loop(max(1, concurrency), duration))
+        report = summarize(samples, time.perf_counter() - start)
+        report["offered_rps"] = rate if rate > 0 else None
+        report["concurrency"] = concurrency if rate <= 0 else None
+        return report
+
+
+def find_saturation(
+        generator: LoadGenerator,
+        start_rate: float,
+        step_factor: float,
+        max_rate: float,
+        duration: float,
+        slo_ms: float,
+        max_error_rate: float,
+) -> Dict[str, Any]:
+    """
+    Увеличивает интенсивность открытого потока, пока не нарушено одно из условий:
+    p99 не больше slo_ms, доля ошибок не больше max_error_rate, фактическая
+    пропускная способность не меньше 90% от предложенной.
+    Returns:
+        Dict[str, Any]: Результаты всех шагов и последняя интенсивность, выдержанная сервисом.
+    """
+    steps = []
+    saturation: Optional[Dict[str, Any]] = None
+    rate = start_rate
+    while rate <= max_rate:
+        report = generator.run(duration, rate=rate)
+        healthy = (
+            report["p99_ms"] <= slo_ms
+            and report["error_rate"] <= max_error_rate
+            and report["throughput_rps"] >= 0.9 * rate
+        )
+        report["healthy"] = healthy
+        steps.append(report)
+        print(
+            f"rate={rate:.1f} rps: throughput={report['throughput_rps']} rps "
+            f"p99={report['p99_ms']} ms errors={report['error_rate']:.2%}",
+            file=sys.stderr,
+        )
+        if not healthy:
+            break
+        saturation = report
+        rate *= step_factor
+    return {
+        "saturation_rps": saturation["throughput_rps"] if saturation else 0.0,
+        "saturation_offered_rps": saturation["offered_rps"] if saturation else 0.0,
+        "steps": steps,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_port(port: int, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Port {port} did not open in {timeout} seconds")
+
+
+@contextmanager
+def stub_stack(args: argparse.Namespace) -> Iterator[str]:
+    """
+    Запускает бэкенд и заглушки сервисов поиска и индексации как отдельные процессы.
+    Yields:
+        str: Базовый URL запущенного бэкенда.
+    """
+    query_port, indexing_port, backend_port = _free_port(), _free_port(), _free_port()
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([REPO_ROOT, env.get("PYTHONPATH", "")])
+    env.update({
+        "QUERY_SERVICE": "127.0.0.1",
+        "QUERY_PORT": str(query_port),
+        "INDEXING_SERVICE": "127.0.0.1",
+        "INDEXING_PORT": str(indexing_port),
+    })
+    stub = [sys.executable, "-m", "benchmarks.stub_services", "--error-rate", str(args.stub_error_rate)]
+    commands = [
+        stub + ["--role", "query", "--port", str(query_port),
+                "--latency-ms", str(args.query_latency_ms), "--jitter-ms", str(args.jitter_ms)],
+        stub + ["--role", "indexing", "--port", str(indexing_port),
+                "--latency-ms", str(args.indexing_latency_ms), "--jitter-ms", str(args.jitter_ms)],
+        [sys.executable, "-m", "uvicorn", "backend:app", "--app-dir", "src",
+         "--host", "127.0.0.1", "--port", str(backend_port),
+         "--workers", str(args.backend_workers), "--log-level", "warning"],
+    ]
+    processes = [
+        subprocess.Popen(command, cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL)
+        for command in commands
+    ]
+    try:
+        for port in (query_port, indexing_port, backend_port):
+            _wait_port(port)
+        yield f"http://127.0.0.1:{backend_port}"
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load generator for the RAG backend")
+    parser.add_argument("--target", default="", help="Backend URL, e.g. http://localhost:8001")
+    parser.add_argument("--stub", action="store_true",
+                        help="Start the backend locally with stub query/indexing services")
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed-loop clients")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="Open-loop arrival rate, requests per second")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--mix", nargs="+", default=["search=1"],
+                        help="Request mix, e.g. search=0.9 indexing=0.1")
+    parser.add_argument("--index-url", default=os.getenv("URL_DATA", "http://example.com/data.json"))
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--find-saturation", action="store_true")
+    parser.add_argument("--start-rate", type=float, default=5.0)
+    parser.add_argument("--step-factor", type=float, default=1.5)
+    parser.add_argument("--max-rate", type=float, default=5000.0)
+    parser.add_argument("--slo-ms", type=float, default=2000.0, help="p99 latency objective")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--query-latency-ms", type=float, default=200.0)
+    parser.add_argument("--indexing-latency-ms", type=float, default=1000.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--backend-workers", type=int, default=1)
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+    if not args.stub and not args.target:
+        parser.error("either --target or --stub is required")
+
+    def execute(base_url: str) -> Dict[str, Any]:
+        generator = LoadGenerator(base_url, parse_mix(args.mix), args.index_url, args.timeout, args.seed)
+        if args.find_saturation:
+            return find_saturation(
+                generator, args.start_rate, args.step_factor, args.max_rate,
+                args.duration, args.slo_ms, args.max_error_rate,
+            )
+        return generator.run(args.duration, concurrency=args.concurrency, rate=args.rate)
+
+    if args.stub:
+        with stub_stack(args) as base_url:
+            report = execute(base_url)
+    else:
+        report = execute(args.target)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+"""
+Офлайн микро-бенчмарки предобработки, эмбеддингов, поиска и генерации.
+
+Все измерения выполняются без сети и без docker: корпус генерируется
+(benchmarks.corpus), вместо настоящих моделей используются крошечные модели со
+случайными весами (benchmarks.tiny_models), вместо сервера Qdrant - локальный
+режим qdrant-client в памяти. Результаты сохраняются в JSON и сравниваются с
+сохранённым baseline; замедление больше допуска помечается как регрессия.
+
+Пример:
+    python -m benchmarks.micro --save-baseline
+    python -m benchmarks.micro --fail-on-regression
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_BASELINE = os.path.join(RESULTS_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(RESULTS_DIR, "latest.json")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(
+        fn: Callable[[], Any],
+        repeat: int = 5,
+        warmup: int = 1,
+        items: int = 1,
+        setup: Optional[Callable[[], None]] = None,
+) -> Dict[str, float]:
+    """
+    Измеряет время выполнения функции.
+    Args:
+        fn: функция без аргументов, время которой измеряется.
+        repeat: int - количество измерений.
+        warmup: int - количество прогревочных запусков, не попадающих в статистику.
+        items: int - количество обработанных элементов за один вызов (для items_per_s).
+        setup: функция, вызываемая перед каждым запуском вне измеряемого интервала.
+    Returns:
+        Dict[str, float]: Медиана, среднее, минимум и p95 в секундах и пропускная способность.
+    """
+    timings = []
+    for i in range(warmup + repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            timings.append(elapsed)
+    timings.sort()
+    median = statistics.median(timings)
+    return {
+        "median_s": median,
+        "mean_s": statistics.fmean(timings),
+        "min_s": timings[0],
+        "p95_s": timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))],
+        "repeat": repeat,
+        "items": items,
+        "items_per_s": items / median if median > 0 else 0.0,
+    }
+
+
+def bench_preprocessing(ctx: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    from indexing_service.utils.dedup import deduplicate
+    from indexing_service.utils.preprocessor import clean_and_normalize_text, chunker
+
+    corpus = ctx["corpus"]
+    batch: List[Dict[str, Any]] = []
+
+    def reset() -> None:
+        batch[:] = copy.deepcopy(corpus)
+
+    cleaned = clean_and_normalize_text(copy.deepcopy(corpus))
+    chunks = chunker(copy.deepcopy(cleaned))
+    chunk_batch: List[Dict[str, Any]] = []
+
+    def reset_chunks() -> None:
+        chunk_batch[:] = copy.deepcopy(chunks)
+
+    return {
+        "deduplicate": measure(
+            lambda: deduplicate(chunk_batch, threshold=0.9), ctx["repeat"], items=len(chunks), setup=reset_chunks,
+        ),
+        "clean_and_normalize_text": measure(
+            lambda: clean_and_normalize_text(batch), ctx["repeat"], items=len(corpus), setup=reset,
+        ),
+        "chunker": measure(lambda: chunker(cleaned), ctx["repeat"], items=len(corpus)),
+    }
+
+
+def bench_embedding(ctx: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    model = ctx["indexing_data"].model
+    texts = [item["text"] for item in ctx["chunks"][:ctx["embed_texts"]]]
+    results = {
+        "embedding_single": measure(
+            lambda: [model.generate_embedding(text) for text in texts], ctx["repeat"], items=len(texts),
+        ),
+    }
+    for batch_size in (8, 32):
+        results[f"embedding_batched[bs={batch_size}]"] = measure(
+            lambda: model.generate_embeddings(texts, batch_size=batch_size), ctx["repeat"], items=len(texts),
+        )
+    return results
+
+
+def bench_vector_search(ctx: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import Distance, PointStruct, VectorParams
+
+    indexing_data = ctx["indexing_data"]
+    size = ctx["emb_size"]
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((ctx["search_queries"], size)).astype(np.float32).tolist()
+    results = {}
+    for corpus_size in ctx["search_sizes"]:
+        client = QdrantClient(":memory:")
+        client.create_collection(
+            collection_name=indexing_data.collection_name,
+            vectors_config=VectorParams(size=size, distance=Distance.COSINE),
+        )
+        for start in range(0, corpus_size, 1000):
+            count = min(1000, corpus_size - start)
+            vectors = rng.standard_normal((count, size)).astype(np.float32)
+            client.upsert(
+                collection_name=indexing_data.collection_name,
+                points=[
+                    PointStruct(id=start + i, vector=vectors[i].tolist(), payload={"ru_wiki_pageid": 0})
+                    for i in range(count)
+                ],
+            )
+            indexing_data.docstore.put_many(
+                (start + i, ctx["chunks"][(start + i) % len(ctx["chunks"])]["text"]) for i in range(count)
+            )
+        indexing_data.client = client
+        results[f"vector_search[n={corpus_size}]"] = measure(
+            lambda: [
+                client.search(collection_name=indexing_data.collection_name, query_vector=q, limit=1)
+                for q in queries
+            ],
+            ctx["repeat"],
+            items=len(queries),
+        )
+        results[f"search_data[n={corpus_size}]"] = measure(
+            lambda: indexing_data.search_data("Какой город расположен на реке Волга?"), ctx["repeat"],
+        )
+        texts = [item["text"][:200] for item in ctx["chunks"][:len(queries)]]
+        results[f"search_data_batch[n={corpus_size}]"] = measure(
+            lambda: indexing_data.search_data_batch(texts), ctx["repeat"], items=len(texts),
+        )
+        client.close()
+    return results
+
+
+def bench_generation(ctx: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    from prometheus_client import REGISTRY
+    from query_service.utils.local_llm import CustomQueryLLM
+
+    def sample(name: str, labels: Optional[Dict[str, str]] = None) -> float:
+        return REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+    llm = CustomQueryLLM(
+        ctx["model_path"],
+        system_prompt="Информация из базы: {text}",
+        torch_dtype="FLOAT32",
+        max_new_tokens=ctx["max_new_tokens"],
+    )
+    context = " ".join(item["text"] for item in ctx["chunks"][:2])
+    prompt = "Какой город расположен на реке Волга?"
+    llm.generate(text=context, prompt=prompt)
+    prefill, decode, tokens = [], [], []
+    for _ in range(ctx["repeat"]):
+        before = (
+            sample("rag_stage_duration_seconds_sum", {"stage": "prefill"}),
+            sample("rag_stage_duration_seconds_sum", {"stage": "decode"}),
+            sample("rag_generated_tokens_total"),
+        )
+        llm.generate(text=context, prompt=prompt)
+        prefill.append(sample("rag_stage_duration_seconds_sum", {"stage": "prefill"}) - before[0])
+        decode.append(sample("rag_stage_duration_seconds_sum", {"stage": "decode"}) - before[1])
+        tokens.append(sample("rag_generated_tokens_total") - before[2])
+    prompt_tokens = len(llm.tokenizer.apply_chat_template(
+        [{"role": "system", "content": llm.system_prompt.format(text=context)}, {"role": "user", "content": prompt}],
+        tokenize=True,
+        add_generation_prompt=True,
+    ))
+    decode_per_token = [d / max(1.0, t - 1) for d, t in zip(decode, tokens)]
+    batch = ctx["generate_batch"]
+    return {
+        "generate_prefill": _stats(prefill, prompt_tokens),
+        "generate_decode_per_token": _stats(decode_per_token, 1),
+        f"generate_sequential[n={batch}]": measure(
+            lambda: [llm.generate(text=context, prompt=prompt) for _ in range(batch)],
+            ctx["repeat"],
+            items=batch,
+        ),
+        f"generate_batch[n={batch}]": measure(
+            lambda: llm.generate_batch([context] * batch, [prompt] * batch, batch_size=batch),
+            ctx["repeat"],
+            items=batch,
+        ),
+    }
+
+
+def bench_session(ctx: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    from query_service.utils.local_llm import CustomQueryLLM
+    from query_service.utils.sessions import Session
+
+    llm = CustomQueryLLM(
+        ctx["model_path"],
+        system_prompt="Информация из базы: {text}",
+        torch_dtype="FLOAT32",
+        max_new_tokens=ctx["max_new_tokens"],
+    )
+    # Длинный контекст первого хода, чтобы prefill был заметен на фоне decode.
+    context = " ".join(item["text"] for item in ctx["chunks"][:16])
+    followup = ctx["chunks"][16]["text"]
+    first = Session("bench")
+    llm.chat(first, text=context, prompt="Какой город расположен на реке Волга?")
+
+    def followup_turn(cached: bool) -> Callable[[], Any]:
+        session = Session("bench")
+        session.messages = list(first.messages)
+        if cached:
+            session.token_ids = list(first.token_ids)
+            session.cache = copy.deepcopy(first.cache)
+        return lambda: llm.chat(session, text=followup, prompt="А какой город стоит на Неве?")
+
+    results = {}
+    for name, cached in (("followup_full_prefill", False), ("followup_cached_prefill", True)):
+        timings = []
+        for _ in range(ctx["repeat"]):
+            turn = followup_turn(cached)
+            start = time.perf_counter()
+            turn()
+            timings.append(time.perf_counter() - start)
+        results[name] = _stats(timings, 1)
+    return results
+
+
+def _stats(timings: List[float], items: int) -> Dict[str, float]:
+    timings = sorted(timings)
+    median = statistics.median(timings)
+    return {
+        "median_s": median,
+        "mean_s": statistics.fmean(timings),
+        "min_s": timings[0],
+        "p95_s": timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))],
+        "repeat": len(timings),
+        "items": items,
+        "items_per_s": items / median if median > 0 else 0.0,
+    }
+
+
+def bench_docstore(ctx: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    from indexing_service.utils.docstore import DocStore
+
+    texts = [item["text"] for item in ctx["chunks"]]
+    with tempfile.TemporaryDirectory() as path:
+        store = DocStore(path)
+        write = measure(
+            lambda: store.put_many(enumerate(texts)), ctx["repeat"], items=len(texts),
+        )
+        rng = np.random.default_rng(0)
+        ids = rng.integers(0, len(texts), size=ctx["search_queries"]).tolist()
+        read = measure(lambda: store.get_many(ids), ctx["repeat"], items=len(ids))
+    return {"docstore_put_many": write, "docstore_get_many": read}
+
+
+BENCHMARKS = {
+    "docstore": bench_docstore,
+    "preprocessing": bench_preprocessing,
+    "embedding": bench_embedding,
+    "vector_search": bench_vector_search,
+    "generation": bench_generation,
+    "session": bench_session,
+}
+
+
+def compare(
+        results: Dict[str, Dict[str, float]],
+        baseline: Dict[str, Dict[str, float]],
+        tolerance: float,
+) -> List[Dict[str, Any]]:
+    """
+    Сравнивает медианы текущего прогона с baseline.
+    Args:
+        results: результаты текущего прогона.
+        baseline: результаты сохранённого прогона.
+        tolerance: float - допустимое относительное замедление (0.2 = 20%).
+    Returns:
+        Список строк сравнения со статусом "regression", "improvement", "ok" или "new".
+    """
+    rows = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None or not previous.get("median_s"):
+            rows.append({"name": name, "current_s": current["median_s"], "status": "new"})
+            continue
+        ratio = current["median_s"] / previous["median_s"]
+        if ratio > 1 + tolerance:
+            status = "regression"
+        elif ratio < 1 / (1 + tolerance):
+            status = "improvement"
+        else:
+            status = "ok"
+        rows.append({
+            "name": name,
+            "baseline_s": previous["median_s"],
+            "current_s": current["median_s"],
+            "ratio": ratio,
+            "status": status,
+        })
+    return rows
+
+
+def _prepare_context(args: argparse.Namespace, workdir: str) -> Dict[str, Any]:
+    from benchmarks.corpus import generate_corpus
+    from benchmarks.tiny_models import build_tiny_model
+    from indexing_service.utils.preprocessor import preprocessor
+
+    model_path = build_tiny_model(os.path.join(workdir, "tiny_model"), hidden_size=args.emb_size)
+    os.environ["EMB_MODEL"] = model_path
+    os.environ["EMB_SIZE"] = str(args.emb_size)
+    os.environ.setdefault("NUMBER_CHUNKS", "1")
+    os.environ["DOCSTORE_PATH"] = os.path.join(workdir, "docstore")
+    # indexing_data импортирует свои зависимости как `utils.*`, как в контейнере.
+    sys.path.insert(0, os.path.join(REPO_ROOT, "indexing_service"))
+    from utils import indexing_data
+
+    corpus = generate_corpus(args.documents, seed=args.seed)
+    return {
+        "corpus": corpus,
+        "chunks": preprocessor(copy.deepcopy(corpus)),
+        "indexing_data": indexing_data,
+        "model_path": model_path,
+        "emb_size": args.emb_size,
+        "repeat": args.repeat,
+        "embed_texts": args.embed_texts,
+        "search_sizes": args.search_sizes,
+        "search_queries": args.search_queries,
+        "max_new_tokens": args.max_new_tokens,
+        "generate_batch": args.generate_batch,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline micro-benchmarks of the RAG pipeline")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), default=sorted(BENCHMARKS))
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--embed-texts", type=int, default=64)
+    parser.add_argument("--search-sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--search-queries", type=int, default=20)
+    parser.add_argument("--emb-size", type=int, default=64)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--generate-batch", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Save the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative slowdown before a regression is reported")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+    # Сервисы подробно логируют каждый запрос, в бенчмарке это только искажает время.
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        ctx = _prepare_context(args, workdir)
+        for name in args.only:
+            print(f"Running {name}...", file=sys.stderr)
+            results.update(BENCHMARKS[name](ctx))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    regressions = 0
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        rows = compare(results, baseline, args.tolerance)
+        regressions = sum(row["status"] == "regression" for row in rows)
+        for row in rows:
+            ratio = f"{row['ratio']:.2f}x" if "ratio" in row else "-"
+            print(f"{row['name']:<40} {row['current_s'] * 1000:>10.2f} ms  {ratio:>7}  {row['status']}")
+    else:
+        for name, stats in results.items():
+            print(f"{name:<40} {stats['median_s'] * 1000:>10.2f} ms  {stats['items_per_s']:>10.1f} items/s")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Бенчмарк памяти и пропускной способности prefork-режима (common.prefork) в
+зависимости от числа воркеров.
+
+Для каждого числа воркеров запускается сервер, измеряется суммарный PSS всех его
+процессов (разделяемые страницы учитываются пропорционально, поэтому общие веса
+не считаются дважды) и число запросов в секунду при заданной конкурентности.
+
+Пример:
+    python -m benchmarks.prefork_benchmark --workers 1 2 4 --model-mb 512
+    python -m benchmarks.prefork_benchmark --app indexing_main:app --app-dir indexing_service
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List
+
+import requests
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _children(pid: int) -> List[int]:
+    """
+    Возвращает pid всех прямых потомков процесса (Linux, /proc).
+    """
+    path = f"/proc/{pid}/task/{pid}/children"
+    try:
+        with open(path) as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def _pss_mb(pid: int) -> float:
+    """
+    Возвращает PSS процесса в мегабайтах по данным /proc/<pid>/smaps_rollup.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def _wait_ready(url: str, timeout: float) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.post(url, json={"query": "ping"}, timeout=5)
+            return
+        except requests.exceptions.RequestException:
+            time.sleep(0.5)
+    raise TimeoutError(f"Server at {url} did not start in {timeout} seconds")
+
+
+def _throughput(url: str, concurrency: int, duration: float) -> Dict[str, float]:
+    """
+    Отправляет запросы из concurrency потоков в течение duration секунд.
+    """
+    counts = [0] * concurrency
+    errors = [0] * concurrency
+    stop_at = time.time() + duration
+
+    def client(index: int) -> None:
+        session = requests.Session()
+        while time.time() < stop_at:
+            try:
+                response = session.post(url, json={"query": "Что такое машинное обучение?"}, timeout=60)
+                response.raise_for_status()
+                counts[index] += 1
+            except requests.exceptions.RequestException:
+                errors[index] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {"rps": sum(counts) / duration, "errors": sum(errors)}
+
+
+def run_case(args: argparse.Namespace, workers: int) -> Dict[str, float]:
+    """
+    Запускает сервер с заданным числом воркеров и возвращает результаты измерений.
+    """
+    port = _free_port()
+    env = dict(os.environ, BENCH_MODEL_MB=str(args.model_mb))
+    env["PYTHONPATH"] = os.pathsep.join([os.getcwd(), env.get("PYTHONPATH", "")])
+    process = subprocess.Popen(
+        [sys.executable, "-m", "common.prefork", args.app,
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+        cwd=args.app_dir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}{args.endpoint}"
+    try:
+        _wait_ready(url, args.startup_timeout)
+        result = _throughput(url, args.concurrency or workers * 2, args.duration)
+        pids = [process.pid] + _children(process.pid)
+        result["workers"] = workers
+        result["processes"] = len(pids)
+        result["pss_mb"] = round(sum(_pss_mb(pid) for pid in pids), 1)
+        result["rps"] = round(result["rps"], 2)
+        return result
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Memory and throughput of prefork serving")
+    parser.add_argument("--app", default="benchmarks.stub_model_app:app")
+    parser.add_argument("--app-dir", default=".")
+    parser.add_argument("--endpoint", default="/search/")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--model-mb", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="Client threads, by default twice the number of workers")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+
+    results = [run_case(args, workers) for workers in args.workers]
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
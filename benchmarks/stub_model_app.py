@@ -0,0 +1,41 @@
+"""
+Минимальное приложение для бенчмарка prefork-режима: при импорте создаёт модель
+torch заданного размера (BENCH_MODEL_MB, по умолчанию 256 МБ) и выполняет по ней
+прямой проход на каждый запрос к "/search/". Позволяет измерять память и
+пропускную способность без загрузки настоящих весов.
+"""
+import os
+import torch
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+HIDDEN_SIZE = 1024
+
+
+def build_model(size_mb: int) -> torch.nn.Module:
+    """
+    Создаёт стек линейных слоёв, суммарный размер весов которого примерно равен size_mb.
+    """
+    layer_bytes = HIDDEN_SIZE * HIDDEN_SIZE * 4
+    layers = max(1, size_mb * 1024 * 1024 // layer_bytes)
+    model = torch.nn.Sequential(
+        *[torch.nn.Linear(HIDDEN_SIZE, HIDDEN_SIZE, bias=False) for _ in range(layers)]
+    )
+    model.eval()
+    return model
+
+
+model = build_model(int(os.getenv("BENCH_MODEL_MB", "256")))
+app = FastAPI(title="Prefork benchmark stub")
+
+
+class Query(BaseModel):
+    query: str
+
+
+@app.post("/search/")
+def search(item: Query):
+    with torch.no_grad():
+        inputs = torch.ones(8, HIDDEN_SIZE)
+        outputs = model(inputs)
+    return {"status": "success", "message": str(float(outputs[0, 0]))}
@@ -0,0 +1,71 @@
+"""
+Заглушки сервиса поиска (query_service) и сервиса индексации (indexing_service)
+с настраиваемой задержкой. Позволяют нагружать src/backend.py и межсервисное
+взаимодействие без моделей и базы данных.
+
+Пример:
+    python -m benchmarks.stub_services --role query --port 8040 --latency-ms 200 --jitter-ms 50
+"""
+import argparse
+import asyncio
+import random
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+
+def create_stub_app(
+        role: str,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+) -> FastAPI:
+    """
+    Создаёт приложение-заглушку.
+    Args:
+        role: str - "query" (endpoint "/search/") или "indexing" (endpoints "/indexing/" и "/search/").
+        latency_ms: float - средняя задержка ответа в миллисекундах.
+        jitter_ms: float - стандартное отклонение задержки в миллисекундах.
+        error_rate: float - доля запросов, на которые возвращается HTTP 500.
+    Returns:
+        FastAPI: Приложение-заглушка.
+    """
+    if role not in ("query", "indexing"):
+        raise ValueError(f"Unknown stub role: {role}")
+    app = FastAPI(title=f"Stub {role} service")
+
+    async def respond(message: str):
+        delay = max(0.0, random.gauss(latency_ms, jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        if random.random() < error_rate:
+            return JSONResponse(status_code=500, content={"status": "error", "error": "stub failure"})
+        return {"status": "success", "message": message, "error": ""}
+
+    @app.post("/search/")
+    async def search(item: dict):
+        return await respond(f"Stub answer for: {item.get('query', '')}")
+
+    if role == "indexing":
+        @app.post("/indexing/")
+        async def indexing(item: dict):
+            return await respond("Data indexed successfully")
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stub query/indexing service")
+    parser.add_argument("--role", choices=["query", "indexing"], required=True)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    app = create_stub_app(args.role, args.latency_ms, args.jitter_ms, args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
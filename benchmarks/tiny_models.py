@@ -0,0 +1,80 @@
+"""
+Крошечные модели-заглушки для офлайн-бенчмарков.
+
+Токенизатор (WordLevel по словарю синтетического корпуса) и модель архитектуры Qwen2
+со случайными весами создаются локально и сохраняются в каталог, откуда их
+загружают CustomEmbLLM и CustomQueryLLM через from_pretrained. Сеть не требуется.
+"""
+import os
+from typing import Iterable
+
+import torch
+from tokenizers import Tokenizer, models, pre_tokenizers
+from transformers import PreTrainedTokenizerFast, Qwen2Config, Qwen2ForCausalLM
+
+from benchmarks.corpus import CAPITALS, WORDS
+
+SPECIAL_TOKENS = ["<pad>", "<unk>", "<|im_start|>", "<|im_end|>"]
+CHAT_TEMPLATE = (
+    "{% for message in messages %}<|im_start|>{{ message['role'] }}\n"
+    "{{ message['content'] }}<|im_end|>\n{% endfor %}"
+    "{% if add_generation_prompt %}<|im_start|>assistant\n{% endif %}"
+)
+
+
+def build_tokenizer(extra_words: Iterable[str] = ()) -> PreTrainedTokenizerFast:
+    """
+    Создаёт словный токенизатор со специальными токенами и chat-шаблоном.
+    """
+    words = sorted(set(WORDS) | set(CAPITALS) | set(extra_words))
+    words += [w.capitalize() for w in words] + list(".,:;!?-—()«»'\"") + [str(i) for i in range(10)]
+    vocab = {token: i for i, token in enumerate(SPECIAL_TOKENS)}
+    for word in words:
+        vocab.setdefault(word, len(vocab))
+    tokenizer = Tokenizer(models.WordLevel(vocab=vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    fast = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        pad_token="<pad>",
+        unk_token="<unk>",
+        eos_token="<|im_end|>",
+        additional_special_tokens=["<|im_start|>"],
+        model_input_names=["input_ids", "attention_mask"],
+    )
+    fast.chat_template = CHAT_TEMPLATE
+    return fast
+
+
+def build_tiny_model(path: str, hidden_size: int = 64, layers: int = 2, seed: int = 0) -> str:
+    """
+    Сохраняет в path токенизатор и модель Qwen2 со случайными весами.
+    Модель подходит и для AutoModel (эмбеддинги), и для AutoModelForCausalLM.
+    Args:
+        path: str - каталог для сохранения.
+        hidden_size: int - размер скрытого состояния (размер эмбеддинга).
+        layers: int - количество слоёв.
+        seed: int - зерно инициализации весов.
+    Returns:
+        str: Путь к каталогу с моделью.
+    """
+    if os.path.exists(os.path.join(path, "config.json")):
+        return path
+    os.makedirs(path, exist_ok=True)
+    tokenizer = build_tokenizer(["system", "user", "assistant", "Информация", "базы", "Вопрос"])
+    config = Qwen2Config(
+        vocab_size=len(tokenizer),
+        hidden_size=hidden_size,
+        intermediate_size=hidden_size * 2,
+        num_hidden_layers=layers,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=4096,
+        pad_token_id=tokenizer.pad_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+        bos_token_id=tokenizer.eos_token_id,
+        tie_word_embeddings=True,
+    )
+    torch.manual_seed(seed)
+    Qwen2ForCausalLM(config).save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    return path
@@ -0,0 +1,4 @@
+"""
+Общий код, используемый несколькими сервисами (запуск, метрики и т.п.).
+Каталог копируется в образ каждого сервиса как `/app/common`.
+"""
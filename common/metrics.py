@@ -0,0 +1,244 @@
+"""
+Метрики Prometheus и сквозной идентификатор запроса, общие для всех сервисов.
+
+Каждый этап конвейера измеряется гистограммой `rag_stage_duration_seconds` с меткой
+`stage`. Идентификатор запроса принимается из заголовка `X-Request-ID` (или
+создаётся, если его нет), сохраняется в contextvar, добавляется в логи и
+передаётся дальше при обращении к другим сервисам через `request_headers()`.
+Также передаётся крайний срок запроса `X-Request-Deadline` (unix-время в секундах),
+после которого результат уже не нужен клиенту.
+
+При запуске в несколько процессов (common.prefork) метрики собираются в режиме
+multiprocess через каталог PROMETHEUS_MULTIPROC_DIR.
+"""
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from fastapi import FastAPI, Request, Response
+from loguru import logger
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+DEADLINE_HEADER = "X-Request-Deadline"
+LOG_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+    "{extra[request_id]} | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
+    "<level>{message}</level>"
+)
+STAGE_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="")
+deadline_var: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+STAGE_LATENCY = Histogram(
+    "rag_stage_duration_seconds",
+    "Duration of RAG pipeline stages",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+REQUEST_LATENCY = Histogram(
+    "rag_http_request_duration_seconds",
+    "Duration of HTTP requests handled by the service",
+    ["method", "path", "status"],
+    buckets=STAGE_BUCKETS,
+)
+GENERATED_TOKENS = Counter(
+    "rag_generated_tokens_total",
+    "Number of tokens generated by the query model",
+)
+CACHE_HITS = Counter(
+    "rag_cache_hits_total",
+    "Number of cache hits",
+    ["cache"],
+)
+CACHE_MISSES = Counter(
+    "rag_cache_misses_total",
+    "Number of cache misses",
+    ["cache"],
+)
+SESSION_CACHE_BYTES = Gauge(
+    "rag_session_cache_bytes",
+    "Memory held by cached conversation key/values",
+    multiprocess_mode="livesum",
+)
+PREFILL_SAVED = Histogram(
+    "rag_session_prefill_saved_seconds",
+    "Estimated prefill time saved per turn by reusing the conversation cache",
+    buckets=STAGE_BUCKETS,
+)
+ADMISSION_ACTIVE = Gauge(
+    "rag_admission_active",
+    "Requests currently holding an admission slot",
+    multiprocess_mode="livesum",
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "rag_admission_queue_depth",
+    "Requests waiting for an admission slot",
+    multiprocess_mode="livesum",
+)
+ADMISSION_WAIT = Histogram(
+    "rag_admission_wait_seconds",
+    "Time spent waiting for an admission slot",
+    buckets=STAGE_BUCKETS,
+)
+ADMISSION_REJECTED = Counter(
+    "rag_admission_rejected_total",
+    "Requests rejected by admission control",
+    ["reason"],
+)
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """
+    Контекстный менеджер, записывающий длительность этапа конвейера в гистограмму.
+    Args:
+        stage: str - название этапа, например "embed" или "vector_search".
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """
+    Записывает уже измеренную длительность этапа конвейера.
+    Args:
+        stage: str - название этапа.
+        seconds: float - длительность в секундах.
+    """
+    STAGE_LATENCY.labels(stage=stage).observe(seconds)
+
+
+def get_request_id() -> str:
+    """
+    Возвращает идентификатор текущего запроса или пустую строку вне запроса.
+    """
+    return request_id_var.get()
+
+
+def get_deadline() -> Optional[float]:
+    """
+    Возвращает крайний срок текущего запроса (unix-время) или None, если он не задан.
+    """
+    return deadline_var.get()
+
+
+def remaining_time() -> Optional[float]:
+    """
+    Возвращает время в секундах до крайнего срока текущего запроса
+    (отрицательное, если срок истек) или None, если срок не задан.
+    """
+    deadline = get_deadline()
+    return None if deadline is None else deadline - time.time()
+
+
+def request_deadline(timeout: float) -> float:
+    """
+    Вычисляет крайний срок для запроса к следующему сервису: не позже, чем через
+    timeout секунд, и не позже крайнего срока, переданного клиентом.
+    Args:
+        timeout: float - максимальное время обработки запроса в секундах.
+    Returns:
+        float: Крайний срок (unix-время).
+    """
+    deadline = time.time() + timeout
+    client_deadline = get_deadline()
+    return deadline if client_deadline is None else min(deadline, client_deadline)
+
+
+def request_headers(deadline: Optional[float] = None) -> Dict[str, str]:
+    """
+    Формирует заголовки для запроса к другому сервису, включая идентификатор
+    и крайний срок текущего запроса.
+    Args:
+        deadline: float - крайний срок (unix-время). По умолчанию передается
+                  крайний срок текущего запроса, если он есть.
+    Returns:
+        Dict[str, str]: Заголовки HTTP-запроса.
+    """
+    headers = {"Content-Type": "application/json"}
+    request_id = get_request_id()
+    if request_id:
+        headers[REQUEST_ID_HEADER] = request_id
+    deadline = deadline if deadline is not None else get_deadline()
+    if deadline is not None:
+        headers[DEADLINE_HEADER] = f"{deadline:.3f}"
+    return headers
+
+
+def _parse_deadline(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def metrics_response() -> Response:
+    """
+    Возвращает текущие значения метрик в текстовом формате Prometheus.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def setup_metrics(app: FastAPI) -> None:
+    """
+    Подключает к приложению endpoint "/metrics" и middleware, которое измеряет
+    длительность запросов и поддерживает идентификатор запроса.
+    Args:
+        app: FastAPI - приложение сервиса.
+    """
+    logger.configure(
+        handlers=[{"sink": sys.stderr, "format": LOG_FORMAT}],
+        extra={"request_id": "-"},
+    )
+
+    @app.middleware("http")
+    async def request_context(request: Request, call_next):
+        request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        deadline_token = deadline_var.set(_parse_deadline(request.headers.get(DEADLINE_HEADER)))
+        start = time.perf_counter()
+        status = 500
+        try:
+            with logger.contextualize(request_id=request_id):
+                response = await call_next(request)
+            status = response.status_code
+            response.headers[REQUEST_ID_HEADER] = request_id
+            return response
+        finally:
+            route = request.scope.get("route")
+            path = getattr(route, "path", request.url.path)
+            if path != "/metrics":
+                REQUEST_LATENCY.labels(
+                    method=request.method, path=path, status=str(status),
+                ).observe(time.perf_counter() - start)
+            request_id_var.reset(token)
+            deadline_var.reset(deadline_token)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return metrics_response()
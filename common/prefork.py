@@ -0,0 +1,195 @@
+"""
+Запуск сервиса в режиме prefork.
+
+Модуль приложения (а вместе с ним и модель) импортируется один раз в родительском
+процессе, после чего рабочие процессы создаются через fork(). Веса модели доступны
+воркерам только на чтение, поэтому их страницы памяти остаются общими (copy-on-write)
+и потребление RAM почти не растёт с числом воркеров. Все воркеры принимают соединения
+с одного сокета, открытого родителем.
+
+Пример:
+    python -m common.prefork indexing_main:app --host 0.0.0.0 --port 8050 --workers 4
+"""
+import argparse
+import gc
+import importlib
+import os
+import signal
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+import uvicorn
+from loguru import logger
+
+
+def threads_per_worker(workers: int, cpu_count: Optional[int] = None) -> int:
+    """
+    Вычисляет число потоков torch, которое получает каждый воркер.
+    Args:
+        workers: int - количество рабочих процессов.
+        cpu_count: int - количество доступных ядер. По умолчанию берётся из os.cpu_count().
+    Returns:
+        int: Равная доля ядер на воркер, не меньше 1.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return max(1, cpu_count // max(1, workers))
+
+
+def import_app(app_path: str) -> Any:
+    """
+    Импортирует ASGI-приложение по строке вида "module:attribute".
+    Args:
+        app_path: str - путь к приложению, например "indexing_main:app".
+    Returns:
+        ASGI-приложение.
+    Exceptions:
+        ValueError: Если строка имеет неверный формат или атрибут не найден.
+    """
+    module_name, _, attr = app_path.partition(":")
+    if not module_name or not attr:
+        raise ValueError(f"App path must look like 'module:attribute', got '{app_path}'")
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    module = importlib.import_module(module_name)
+    try:
+        return getattr(module, attr)
+    except AttributeError as e:
+        raise ValueError(f"Attribute '{attr}' not found in module '{module_name}'") from e
+
+
+def _set_torch_threads(threads: int) -> None:
+    """
+    Устанавливает число intra-op потоков torch, если torch установлен
+    (в образе backend его нет).
+    """
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+
+def _run_worker(config: uvicorn.Config, sock: Any, threads: int) -> None:
+    """
+    Тело рабочего процесса: выставляет свою долю потоков и обслуживает запросы
+    с общего сокета до получения сигнала остановки.
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    _set_torch_threads(threads)
+    logger.info(f"Worker {os.getpid()} started with {threads} torch threads")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def _worker_exit_code(index: int, config: uvicorn.Config, sock: Any, threads: int) -> int:
+    """
+    Запускает рабочий процесс и возвращает его код завершения: 0 после штатной
+    остановки, 1 если воркер упал (трассировка записывается в лог, чтобы родитель
+    не перезапускал упавший воркер молча).
+    """
+    try:
+        _run_worker(config, sock, threads)
+    except BaseException:
+        logger.exception(f"Worker {index} crashed")
+        return 1
+    return 0
+
+
+def _mark_process_dead(pid: int) -> None:
+    """
+    Удаляет файлы live-метрик завершившегося воркера в режиме multiprocess.
+    """
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(pid)
+
+
+def serve(app_path: str, host: str, port: int, workers: int) -> None:
+    """
+    Загружает приложение в родительском процессе и запускает workers рабочих
+    процессов через fork(). Упавшие воркеры перезапускаются, SIGTERM/SIGINT
+    пересылаются воркерам.
+    Args:
+        app_path: str - путь к приложению, например "query_main:app".
+        host: str - адрес, на котором слушает сервис.
+        port: int - порт сервиса.
+        workers: int - количество рабочих процессов.
+    """
+    workers = max(1, workers)
+    threads = threads_per_worker(workers)
+    # Родитель не должен запускать пул потоков OpenMP до fork(), иначе дочерние
+    # процессы могут зависнуть на первой параллельной операции.
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    _set_torch_threads(1)
+    # Метрики воркеров агрегируются через общий каталог; переменная должна быть
+    # задана до импорта prometheus_client приложением.
+    if workers > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus_")
+
+    app = import_app(app_path)
+    logger.info(f"Application '{app_path}' loaded in parent process {os.getpid()}")
+    # Объекты, созданные при загрузке, переносятся в постоянное поколение, чтобы
+    # сборщик мусора в воркерах не трогал их заголовки и не копировал страницы.
+    gc.collect()
+    gc.freeze()
+
+    config = uvicorn.Config(app, host=host, port=port)
+    sock = config.bind_socket()
+    sock.set_inheritable(True)
+
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            os._exit(_worker_exit_code(index, config, sock, threads))
+        children[pid] = index
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for index in range(workers):
+        spawn(index)
+    logger.info(f"Started {workers} workers on {host}:{port}, {threads} torch threads each")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        _mark_process_dead(pid)
+        if index is None or stopping:
+            continue
+        logger.warning(f"Worker {index} ({pid}) exited with code {os.waitstatus_to_exitcode(status)}, restarting")
+        time.sleep(1)
+        spawn(index)
+    sock.close()
+    logger.info("All workers stopped")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prefork server with shared model weights")
+    parser.add_argument("app", help="Application path, e.g. indexing_main:app")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    serve(args.app, args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    main()
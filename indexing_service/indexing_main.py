@@ -1,17 +1,20 @@
 from fastapi import FastAPI
 from pydantic import BaseModel
-from utils.downloader import load_json_from_url
+from utils.downloader import load_sources
 from utils.preprocessor import preprocessor
-from utils.indexing_data import index_data, search_data
+from utils.indexing_data import index_data, rebuild_index, search_data, search_data_batch
+from common.metrics import setup_metrics
 from loguru import logger
 from dotenv import load_dotenv
-from typing import Union, List
+from typing import Any, Dict, Union, List, Tuple
+import os
 
 load_dotenv()
 app = FastAPI(
     title="Indexing service",
     description="API for indexing data to database and search relevant chunks",
 )
+setup_metrics(app)
 
 
 class UrlObject(BaseModel):
@@ -19,8 +22,12 @@ class UrlObject(BaseModel):
     Модель данных для URL, используемая для валидации входных данных.
     Атрибуты:
         url: str - URL для индексации.
+        sources: List[str] - несколько источников для индексации: HTTP(S) URL и пути
+                 к локальным файлам JSON, JSONL, Parquet или сжатым gzip внутри каталога
+                 INGEST_ROOT. Если указаны, поле url не используется.
     """
-    url : str
+    url : str = ""
+    sources: List[str] = []
 
 
 class Query(BaseModel):
@@ -45,34 +52,146 @@ class ApiResponse(BaseModel):
     error: str = ""
 
 
-@app.post("/indexing/", response_model=ApiResponse)
+class SourceStatus(BaseModel):
+    """
+    Модель данных для результата загрузки одного источника.
+    Атрибуты:
+        source: str - URL или путь к файлу.
+        status: str - "success" или "error".
+        records: int - количество загруженных записей.
+        error: str - текст ошибки загрузки.
+    """
+    source: str
+    status: str
+    records: int = 0
+    error: str = ""
+
+
+class IndexingApiResponse(ApiResponse):
+    """
+    Модель данных для ответа на запрос индексации.
+    Атрибуты:
+        sources: List[SourceStatus] - результаты загрузки по каждому источнику.
+    """
+    sources: List[SourceStatus] = []
+
+
+class BatchQuery(BaseModel):
+    """
+    Модель данных для пакетного запроса на поиск.
+    Атрибуты:
+        queries: List[str] - тексты запросов пользователей.
+    """
+    queries: List[str]
+
+
+class BatchApiResponse(BaseModel):
+    """
+    Модель данных для ответа на пакетный запрос.
+    Атрибуты:
+        status: str - статус всего пакета: "success", "warning" (часть запросов не
+                выполнена) или "error" (не выполнен ни один запрос).
+        results: List[ApiResponse] - результаты по каждому запросу в исходном порядке.
+        error: str - текст ошибки, из-за которой не удалось обработать весь пакет.
+    """
+    status: str
+    results: List[ApiResponse] = []
+    error: str = ""
+
+
+def load_item_sources(item: UrlObject) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Параллельно (не больше INGEST_PARALLELISM одновременно) загружает записи из
+    источников запроса, а если список источников пуст - из поля url.
+    Returns:
+        Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]: Записи всех источников и
+            статусы загрузки каждого источника.
+    Exceptions:
+        ValueError: Если в запросе не указан ни один источник.
+    """
+    sources = item.sources or ([item.url] if item.url else [])
+    if not sources:
+        raise ValueError("Either url or sources must be provided")
+    data, statuses = load_sources(sources, parallelism=int(os.getenv("INGEST_PARALLELISM", "4")))
+    logger.info(f"Downloaded {len(data)} records from {len(sources)} sources")
+    return data, statuses
+
+
+@app.post("/indexing/", response_model=IndexingApiResponse)
 def indexing(item : UrlObject):
     """
-    Endpoint для индексации данных из указанного URL.
+    Endpoint для индексации данных из указанного URL или нескольких источников.
+    Записи всех источников проходят одну общую предобработку и индексацию.
     Args:
-        item: UrlObject, содержащий URL данных для индексации.
+        item: UrlObject, содержащий URL или список источников данных для индексации.
     Returns:
-        ApiResponse: Объект, содержащий статус и сообщение об операции.
+        IndexingApiResponse: Объект, содержащий статус и сообщение об операции, а также
+                     статус загрузки каждого источника.
                      Возможные статусы:
                      - "success": Данные успешно проиндексированы.
                      - "error": Произошла ошибка во время загрузки, предобработки или индексации.
-                     - "warning": Данные оказались пустыми после предобработки.
+                     - "warning": Часть источников не удалось загрузить, данные остальных
+                       проиндексированы.
     """
-    logger.info(f"Received indexing request for URL: {item.url}")
+    logger.info(f"Received indexing request for URL: {item.url}, sources: {item.sources}")
+    statuses = []
     try:
-        data = load_json_from_url(item.url)
-        logger.info(f"Successfully downloaded data from {item.url}")
+        data, statuses = load_item_sources(item)
+        failed = [status for status in statuses if status["status"] == "error"]
+        if len(failed) == len(statuses):
+            raise ValueError("No source was loaded")
         data = preprocessor(data)
         logger.info("Data preprocessing completed successfully.")
         index_data(data)
         logger.info("Data indexing completed successfully.")
-        return ApiResponse(status="success", message="Data indexed successfully")
+        if failed:
+            return IndexingApiResponse(
+                status="warning",
+                message=f"Data indexed, {len(failed)} of {len(statuses)} sources failed",
+                sources=statuses,
+            )
+        return IndexingApiResponse(status="success", message="Data indexed successfully", sources=statuses)
     except Exception as e:
         logger.error(f"Error during data indexing: {e}")
-        return ApiResponse(
+        return IndexingApiResponse(
             status="error", 
             message="Indexing failed", 
-            error=str(e)
+            error=str(e),
+            sources=statuses,
+        )
+
+
+@app.post("/indexing/rebuild/", response_model=IndexingApiResponse)
+def rebuild(item : UrlObject):
+    """
+    Endpoint для полной переиндексации без остановки поиска: данные загружаются в новую
+    версию коллекции, после построения индекса и проверки алиас коллекции переключается
+    на нее, старые версии удаляются. Если хотя бы один источник не загрузился,
+    переиндексация не выполняется, чтобы не потерять его данные в новой версии.
+    Args:
+        item: UrlObject, содержащий URL или список источников данных для индексации.
+    Returns:
+        IndexingApiResponse: Объект, содержащий статус, имя новой версии коллекции и
+                             статус загрузки каждого источника.
+    """
+    logger.info(f"Received rebuild request for URL: {item.url}, sources: {item.sources}")
+    statuses = []
+    try:
+        data, statuses = load_item_sources(item)
+        failed = [status["source"] for status in statuses if status["status"] == "error"]
+        if failed:
+            raise ValueError(f"Failed to load sources: {', '.join(failed)}")
+        data = preprocessor(data)
+        logger.info("Data preprocessing completed successfully.")
+        version = rebuild_index(data)
+        return IndexingApiResponse(status="success", message=f"Index rebuilt into {version}", sources=statuses)
+    except Exception as e:
+        logger.error(f"Error during index rebuild: {e}")
+        return IndexingApiResponse(
+            status="error",
+            message="Rebuild failed",
+            error=str(e),
+            sources=statuses,
         )
 
 
@@ -97,3 +216,44 @@ async def search(item : Query):
                 message="Searching failed", 
                 error=str(e)
             )
+
+
+def batch_status(results: List[ApiResponse]) -> str:
+    """
+    Возвращает статус пакета по результатам отдельных запросов: "success", если
+    все запросы выполнены, "error", если ни один, и "warning" при частичной ошибке.
+    """
+    succeeded = sum(result.status == "success" for result in results)
+    if succeeded == len(results):
+        return "success"
+    return "warning" if succeeded else "error"
+
+
+@app.post("/search/batch", response_model=BatchApiResponse)
+def search_batch(item: BatchQuery):
+    """
+    Endpoint для пакетного поиска: эмбеддинги всех запросов вычисляются одним
+    проходом модели, поиск в базе выполняется одним пакетным запросом.
+    Args:
+        item: BatchQuery, содержащий список поисковых запросов.
+    Returns:
+        BatchApiResponse: Результаты по каждому запросу в исходном порядке.
+                          Пустые запросы получают статус "error", статус пакета
+                          "warning" или "error", если выполнена часть запросов или ни один.
+    """
+    logger.info(f"Received batch search request with {len(item.queries)} queries")
+    results = [
+        ApiResponse(status="error", message="Searching failed", error="Empty query")
+        for _ in item.queries
+    ]
+    valid = [i for i, query in enumerate(item.queries) if query.strip()]
+    try:
+        texts = search_data_batch([item.queries[i] for i in valid])
+    except Exception as e:
+        logger.error(f"Error during batch searching: {e}")
+        for i in valid:
+            results[i] = ApiResponse(status="error", message="Searching failed", error=str(e))
+        return BatchApiResponse(status="error", results=results, error=str(e))
+    for i, text in zip(valid, texts):
+        results[i] = ApiResponse(status="success", message=text)
+    return BatchApiResponse(status=batch_status(results), results=results)
@@ -0,0 +1,157 @@
+"""
+Удаление почти одинаковых чанков перед вычислением эмбеддингов.
+
+Для каждого чанка строится MinHash-сигнатура по множеству словных шинглов. Кандидаты
+в дубликаты находятся через LSH: сигнатура делится на полосы, чанки с совпадающей
+полосой попадают в одну корзину, поэтому сравниваются только кандидаты, а не все
+пары. Кандидаты с оценкой сходства Жаккара не ниже порога объединяются в кластеры,
+от каждого кластера остается первый чанк, а идентификаторы страниц остальных
+записываются в его поле "alt_pageids".
+"""
+import re
+import zlib
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+from loguru import logger
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int = 5) -> List[bytes]:
+    """
+    Возвращает словные шинглы текста (последовательности из size слов).
+    Тексты короче size слов дают один шингл из всех слов.
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        return [" ".join(words).encode("utf-8")]
+    return [" ".join(words[i:i + size]).encode("utf-8") for i in range(len(words) - size + 1)]
+
+
+def minhash_signatures(texts: List[str], num_perm: int = 128, shingle_size: int = 5, seed: int = 1) -> np.ndarray:
+    """
+    Вычисляет MinHash-сигнатуры текстов.
+    Args:
+        texts: List[str] - тексты.
+        num_perm: int - количество хеш-функций (длина сигнатуры).
+        shingle_size: int - количество слов в шингле.
+        seed: int - зерно для параметров хеш-функций.
+    Returns:
+        np.ndarray: Матрица сигнатур размера (len(texts), num_perm).
+    """
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint64)
+    for i, text in enumerate(texts):
+        hashes = np.fromiter((zlib.crc32(s) for s in shingles(text, shingle_size)), dtype=np.uint64)
+        # Переполнение uint64 допустимо: результат остается хеш-функцией.
+        with np.errstate(over="ignore"):
+            permuted = (hashes[:, None] * a + b) % MERSENNE_PRIME & MAX_HASH
+        signatures[i] = permuted.min(axis=0)
+    return signatures
+
+
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Подбирает число полос и строк в полосе так, чтобы порог срабатывания LSH
+    (1 / bands) ** (1 / rows) был ближе всего к threshold.
+    Returns:
+        Tuple[int, int]: (bands, rows), bands * rows == num_perm.
+    """
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    return min(options, key=lambda p: abs((1 / p[0]) ** (1 / p[1]) - threshold))
+
+
+def find_clusters(signatures: np.ndarray, threshold: float) -> List[int]:
+    """
+    Группирует почти одинаковые тексты в кластеры.
+    Args:
+        signatures: np.ndarray - MinHash-сигнатуры.
+        threshold: float - минимальная оценка сходства Жаккара для дубликатов.
+    Returns:
+        List[int]: Для каждого текста индекс представителя его кластера
+                   (наименьший индекс в кластере).
+    """
+    count, num_perm = signatures.shape
+    parent = list(range(count))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    bands, rows = lsh_params(threshold, num_perm)
+    checked = set()
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = {}
+        for i, key in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+            buckets.setdefault(key.tobytes(), []).append(i)
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                if (first, other) in checked:
+                    continue
+                checked.add((first, other))
+                if np.mean(signatures[first] == signatures[other]) >= threshold:
+                    root_first, root_other = find(first), find(other)
+                    if root_first != root_other:
+                        parent[max(root_first, root_other)] = min(root_first, root_other)
+    return [find(i) for i in range(count)]
+
+
+def deduplicate(
+        data: List[Dict[str, Any]],
+        threshold: float = 0.9,
+        num_perm: int = 128,
+) -> List[Dict[str, Any]]:
+    """
+    Оставляет по одному чанку из каждой группы почти одинаковых чанков.
+    Args:
+        data: Список словарей с ключами "text" и "ru_wiki_pageid".
+        threshold: float - минимальная оценка сходства Жаккара для дубликатов.
+        num_perm: int - длина MinHash-сигнатуры.
+    Returns:
+        Список представителей в исходном порядке. Если у кластера были дубликаты с
+        других страниц, их ru_wiki_pageid записываются в поле "alt_pageids" представителя.
+    """
+    if not data:
+        return data
+    roots = find_clusters(minhash_signatures([item["text"] for item in data], num_perm), threshold)
+    alternates: Dict[int, set] = {}
+    for i, root in enumerate(roots):
+        if root != i:
+            alternates.setdefault(root, set()).add(data[i]["ru_wiki_pageid"])
+    result = []
+    for i, item in enumerate(data):
+        if roots[i] != i:
+            continue
+        pages = alternates.get(i, set()) - {item["ru_wiki_pageid"]}
+        if pages:
+            item["alt_pageids"] = sorted(pages)
+        result.append(item)
+    logger.info(f"Deduplication at threshold {threshold}: kept {len(result)} of {len(data)} chunks")
+    return result
+
+
+def dedup_report(
+        data: List[Dict[str, Any]],
+        thresholds: Iterable[float] = (0.5, 0.7, 0.8, 0.9, 0.95),
+        num_perm: int = 128,
+) -> Dict[float, int]:
+    """
+    Считает, сколько чанков было бы удалено при разных порогах. Сигнатуры
+    вычисляются один раз для всех порогов.
+    Returns:
+        Dict[float, int]: Количество удаленных чанков для каждого порога.
+    """
+    signatures = minhash_signatures([item["text"] for item in data], num_perm)
+    report = {}
+    for threshold in thresholds:
+        roots = find_clusters(signatures, threshold)
+        report[threshold] = sum(root != i for i, root in enumerate(roots))
+    return report
@@ -0,0 +1,196 @@
+"""
+Локальное хранилище текстов чанков (docstore).
+
+Тексты хранятся вне Qdrant, в append-only сегментном файле: каждый текст записан
+отдельным zstd-фреймом. Рядом лежит индекс из записей фиксированного размера
+(идентификатор точки, смещение, длина). Сегмент читается через mmap, и фрейм
+распаковывается прямо из отображённой памяти без промежуточного копирования.
+Повторная запись с тем же идентификатором добавляет новый фрейм, и индекс начинает
+указывать на него; старые данные остаются в сегменте.
+
+Хранилище можно открыть из нескольких процессов: запись сериализуется блокировкой
+файла индекса, а читатели подхватывают новые записи индекса при промахе.
+"""
+import fcntl
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import zstandard
+from loguru import logger
+
+SEGMENT_FILE = "chunks.seg"
+INDEX_FILE = "chunks.idx"
+INDEX_RECORD = struct.Struct("<QQI")
+
+
+class DocStore():
+    """
+    Append-only хранилище сжатых текстов с доступом по идентификатору точки Qdrant.
+    """
+    def __init__(self, path: str, level: int = 3) -> None:
+        """
+        Открывает (или создаёт) хранилище в каталоге path.
+        Args:
+            path: str - каталог с файлами сегмента и индекса.
+            level: int - уровень сжатия zstd.
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.segment_path = os.path.join(path, SEGMENT_FILE)
+        self.index_path = os.path.join(path, INDEX_FILE)
+        for file_path in (self.segment_path, self.index_path):
+            open(file_path, "ab").close()
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._offsets: Dict[int, Tuple[int, int]] = {}
+        self._index_position = 0
+        self._mmap: Optional[mmap.mmap] = None
+        self._mapped_size = 0
+        self._refresh()
+        logger.info(f"Docstore opened at {path} with {len(self._offsets)} texts")
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __contains__(self, point_id: int) -> bool:
+        return point_id in self._offsets
+
+    @property
+    def next_id(self) -> int:
+        """
+        Наименьший идентификатор, больший всех записанных.
+        """
+        self._refresh()
+        return max(self._offsets, default=-1) + 1
+
+    def put_many(self, items: Iterable[Tuple[int, str]]) -> int:
+        """
+        Добавляет тексты в хранилище.
+        Args:
+            items: пары (идентификатор точки, текст).
+        Returns:
+            int: Количество записанных текстов.
+        """
+        return self._write(lambda: items)
+
+    def append(self, texts: List[str]) -> List[int]:
+        """
+        Добавляет тексты под новыми идентификаторами, которые больше всех уже
+        записанных (в том числе другими процессами).
+        Args:
+            texts: List[str] - тексты для записи.
+        Returns:
+            List[int]: Присвоенные идентификаторы в порядке texts.
+        """
+        ids: List[int] = []
+
+        def items() -> Iterable[Tuple[int, str]]:
+            # Вызывается под блокировкой файла индекса после дочитывания индекса,
+            # поэтому идентификаторы не пересекаются с записями других процессов.
+            start = max(self._offsets, default=-1) + 1
+            ids.extend(range(start, start + len(texts)))
+            return zip(ids, texts)
+
+        self._write(items)
+        return ids
+
+    def _write(self, items_factory) -> int:
+        """
+        Записывает пары (идентификатор, текст), полученные из items_factory, под
+        блокировкой потока и файла индекса.
+        """
+        with self._lock, open(self.index_path, "ab") as index, open(self.segment_path, "ab") as segment:
+            fcntl.flock(index, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                segment.seek(0, os.SEEK_END)
+                offset = segment.tell()
+                records = []
+                for point_id, text in items_factory():
+                    frame = self._compressor.compress(text.encode("utf-8"))
+                    segment.write(frame)
+                    records.append(INDEX_RECORD.pack(point_id, offset, len(frame)))
+                    offset += len(frame)
+                # Индекс пишется только после сегмента, поэтому читатель никогда
+                # не увидит запись, указывающую на ещё не записанные данные.
+                segment.flush()
+                index.write(b"".join(records))
+                index.flush()
+            finally:
+                fcntl.flock(index, fcntl.LOCK_UN)
+            self._refresh()
+        return len(records)
+
+    def get(self, point_id: int) -> Optional[str]:
+        """
+        Возвращает текст по идентификатору точки или None, если его нет.
+        """
+        return self.get_many([point_id])[0]
+
+    def get_many(self, point_ids: List[int]) -> List[Optional[str]]:
+        """
+        Возвращает тексты для списка идентификаторов в том же порядке.
+        Args:
+            point_ids: List[int] - идентификаторы точек.
+        Returns:
+            List[Optional[str]]: Тексты; None для отсутствующих идентификаторов.
+        """
+        if any(point_id not in self._offsets for point_id in point_ids):
+            self._refresh()
+        locations = [self._offsets.get(point_id) for point_id in point_ids]
+        end = max((offset + length for offset, length in filter(None, locations)), default=0)
+        buffer = self._map(end)
+        decompressor = self._decompressor()
+        texts = []
+        for location in locations:
+            if location is None:
+                texts.append(None)
+                continue
+            offset, length = location
+            frame = memoryview(buffer)[offset:offset + length]
+            try:
+                texts.append(decompressor.decompress(frame).decode("utf-8"))
+            finally:
+                frame.release()
+        return texts
+
+    def _decompressor(self) -> zstandard.ZstdDecompressor:
+        """
+        Возвращает распаковщик текущего потока (распаковщики zstd не потокобезопасны).
+        """
+        if not hasattr(self._local, "decompressor"):
+            self._local.decompressor = zstandard.ZstdDecompressor()
+        return self._local.decompressor
+
+    def _map(self, end: int) -> Optional[mmap.mmap]:
+        """
+        Возвращает отображение сегмента, покрывающее как минимум end байт.
+        Старое отображение не закрывается явно: его освободит сборщик мусора, когда
+        завершатся читающие его потоки.
+        """
+        if end <= self._mapped_size:
+            return self._mmap
+        with self._lock:
+            if end > self._mapped_size:
+                with open(self.segment_path, "rb") as segment:
+                    size = os.fstat(segment.fileno()).st_size
+                    self._mmap = mmap.mmap(segment.fileno(), size, access=mmap.ACCESS_READ)
+                self._mapped_size = size
+        return self._mmap
+
+    def _refresh(self) -> None:
+        """
+        Дочитывает новые записи индекса, добавленные этим или другим процессом.
+        """
+        with self._lock:
+            with open(self.index_path, "rb") as index:
+                index.seek(self._index_position)
+                data = index.read()
+            usable = len(data) - len(data) % INDEX_RECORD.size
+            for point_id, offset, length in INDEX_RECORD.iter_unpack(data[:usable]):
+                self._offsets[point_id] = (offset, length)
+            self._index_position += usable
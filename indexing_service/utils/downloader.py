@@ -1,7 +1,15 @@
 import requests
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, List, Dict, Tuple
+from urllib.parse import urlparse
+import contextvars
+import gzip
+import io
 import json
+import mmap
+import os
 from loguru import logger
+from common.metrics import stage_timer
 
 
 def load_json_from_url(url: str) -> List[Dict]:
@@ -13,9 +21,10 @@ def load_json_from_url(url: str) -> List[Dict]:
         Список Document или пустой список в случае ошибки.
     """
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        with stage_timer("download"):
+            response = requests.get(url, timeout=10)
+            response.raise_for_status()
+            data = response.json()
         return data
     except requests.exceptions.RequestException as e:
         logger.info(f"Ошибка при запросе URL: {e}")
@@ -26,3 +35,136 @@ def load_json_from_url(url: str) -> List[Dict]:
     except Exception as e:
         logger.info(f"Неизвестная ошибка: {e}")
         return []
+
+
+def _parse_stream(stream: BinaryIO, name: str) -> List[Dict[str, Any]]:
+    """
+    Разбирает записи из бинарного потока по расширению имени: .json, .jsonl,
+    .parquet, а также любой из них, сжатый gzip (.gz).
+    """
+    if name.endswith(".gz"):
+        with gzip.GzipFile(fileobj=stream) as unpacked:
+            return _parse_stream(unpacked, name[:-3])
+    if name.endswith(".jsonl"):
+        return [json.loads(line) for line in iter(stream.readline, b"") if line.strip()]
+    if name.endswith(".parquet"):
+        return _read_parquet(stream)
+    return json.load(stream)
+
+
+def _read_parquet(source: Any) -> List[Dict[str, Any]]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Reading Parquet requires pyarrow: pip install pyarrow") from e
+    if isinstance(source, str):
+        return pq.read_table(source, memory_map=True).to_pylist()
+    return pq.read_table(source).to_pylist()
+
+
+def load_json_from_file(path: str) -> List[Dict[str, Any]]:
+    """
+    Читает записи из локального файла JSON, JSONL или Parquet (в том числе сжатого gzip).
+    Файл отображается в память (mmap): JSONL разбирается построчно, а gzip
+    распаковывается потоком прямо из отображения, без чтения всего файла в память.
+    Обычный JSON json.load все же копирует целиком в один объект bytes. Parquet
+    читается pyarrow с memory_map. Путь не проверяется: ограничение каталогом
+    INGEST_ROOT выполняет load_source.
+    Args:
+        path: str - путь к файлу.
+    Returns:
+        List[Dict[str, Any]]: Записи файла.
+    Exceptions:
+        OSError: Если файл не удается открыть.
+        ValueError: Если содержимое файла не является списком записей.
+    """
+    with stage_timer("read_file"):
+        if path.endswith(".parquet"):
+            return _read_parquet(path)
+        if os.path.getsize(path) == 0:
+            return []
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            data = _parse_stream(mapped, path)
+    if not isinstance(data, list):
+        raise ValueError(f"{path} must contain a list of records")
+    return data
+
+
+def resolve_local_path(path: str) -> str:
+    """
+    Проверяет, что локальный файл находится внутри каталога INGEST_ROOT (по умолчанию
+    /app/data). Относительные пути отсчитываются от этого каталога, символические
+    ссылки и `..` раскрываются до проверки.
+    Args:
+        path: str - путь к файлу.
+    Returns:
+        str: Абсолютный путь к файлу без символических ссылок.
+    Exceptions:
+        PermissionError: Если файл находится вне INGEST_ROOT.
+    """
+    root = os.path.realpath(os.getenv("INGEST_ROOT", "/app/data"))
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise PermissionError(f"{path} is outside of the ingest root {root}")
+    return resolved
+
+
+def load_source(source: str) -> List[Dict[str, Any]]:
+    """
+    Загружает записи из одного источника: HTTP(S) URL или локального файла
+    (путь или URL вида file://) внутри каталога INGEST_ROOT. В отличие от
+    load_json_from_url, ошибки не подавляются, чтобы вызывающий код мог сообщить
+    статус источника.
+    Args:
+        source: str - URL или путь к файлу.
+    Returns:
+        List[Dict[str, Any]]: Записи источника.
+    Exceptions:
+        requests.exceptions.RequestException: Если загрузка по URL не удалась.
+        PermissionError: Если локальный файл находится вне INGEST_ROOT.
+        OSError, ValueError: Если файл не удается прочитать или разобрать.
+    """
+    parsed = urlparse(source)
+    if parsed.scheme in ("http", "https"):
+        with stage_timer("download"):
+            response = requests.get(source, timeout=10)
+            response.raise_for_status()
+        if parsed.path.endswith((".jsonl", ".parquet", ".gz")):
+            data = _parse_stream(io.BytesIO(response.content), parsed.path)
+        else:
+            data = response.json()
+        if not isinstance(data, list):
+            raise ValueError(f"{source} must contain a list of records")
+        return data
+    return load_json_from_file(resolve_local_path(parsed.path if parsed.scheme == "file" else source))
+
+
+def load_sources(sources: List[str], parallelism: int = 4) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Параллельно загружает записи из нескольких источников, не больше parallelism
+    одновременно. Ошибка одного источника не прерывает загрузку остальных.
+    Args:
+        sources: List[str] - URL и пути к файлам.
+        parallelism: int - максимальное число одновременных загрузок.
+    Returns:
+        Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]: Записи всех успешно
+            загруженных источников в порядке sources и статусы источников: словари
+            с ключами "source", "status" ("success" или "error"), "records" и "error".
+    """
+    def load(source: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        try:
+            data = load_source(source)
+            logger.info(f"Loaded {len(data)} records from {source}")
+            return data, {"source": source, "status": "success", "records": len(data), "error": ""}
+        except Exception as e:
+            logger.error(f"Failed to load {source}: {e}")
+            return [], {"source": source, "status": "error", "records": 0, "error": str(e)}
+
+    if not sources:
+        return [], []
+    # Копия контекста для каждой загрузки, чтобы логи потоков содержали идентификатор запроса.
+    contexts = [contextvars.copy_context() for _ in sources]
+    with ThreadPoolExecutor(max_workers=max(1, min(parallelism, len(sources)))) as executor:
+        loaded = list(executor.map(lambda context, source: context.run(load, source), contexts, sources))
+    records = [record for data, _ in loaded for record in data]
+    return records, [status for _, status in loaded]
@@ -44,3 +44,32 @@ class CustomEmbLLM():
             outputs = self.embed_model(**inputs)
             embeddings = outputs.last_hidden_state[:, -1].tolist()[0]
         return embeddings
+
+    def generate_embeddings(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+        """
+        Генерирует эмбеддинги для списка текстов пакетами по batch_size.
+        Тексты сортируются по длине, чтобы уменьшить число паддинг-токенов в пакете;
+        результат возвращается в исходном порядке. Паддинг выполняется слева, поэтому
+        последний токен каждой строки пакета является последним токеном текста.
+        Args:
+            texts: List[str] - тексты, для которых нужно сгенерировать эмбеддинги.
+            batch_size: int - количество текстов в одном прямом проходе модели.
+        Returns:
+            List[List[float]]: Эмбеддинги в том же порядке, что и texts.
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings: List[List[float]] = [[] for _ in texts]
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            inputs = self.tokenizer(
+                [texts[i] for i in batch],
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=512,
+            )
+            with torch.no_grad():
+                outputs = self.embed_model(**inputs)
+            for i, vector in zip(batch, outputs.last_hidden_state[:, -1].tolist()):
+                embeddings[i] = vector
+        return embeddings
@@ -1,28 +1,162 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 import os
+import shutil
+import threading
+import time
 from dotenv import load_dotenv
 from loguru import logger
 from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance
-from qdrant_client.models import PointStruct
+from qdrant_client.models import VectorParams, Distance, OptimizersConfigDiff, CollectionStatus
+from qdrant_client.models import PointStruct, SearchRequest
+from qdrant_client.models import CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation
 from utils.emb_local_llm import CustomEmbLLM
+from utils.docstore import DocStore, INDEX_FILE, SEGMENT_FILE
+from common.metrics import stage_timer
 
 load_dotenv()
 collection_name = os.getenv("COLLECT_NAME", "my_collection")
 model = CustomEmbLLM(model_name=os.getenv("EMB_MODEL"))
+docstore_root = os.getenv("DOCSTORE_PATH", "docstore")
+# Хранилище текстов коллекции collection_name, пока она не заменена алиасом.
+# У каждой версии коллекции, созданной rebuild_index, свое хранилище в
+# DOCSTORE_PATH/<версия>, которое удаляется вместе с версией.
+docstore = DocStore(docstore_root)
+version_docstores: Dict[str, DocStore] = {}
+version_docstores_lock = threading.Lock()
+DOCSTORE_FIELD = "docstore"
 client = QdrantClient(
     url=f"http://{os.getenv('DB_SERVICE', 'database')}:{os.getenv('DB_PORT', '6333')}", # noqa E501
 )
 
 
+def _create_collection(name: str, deferred_indexing: bool = False) -> None:
+    """
+    Создает коллекцию Qdrant для эмбеддингов.
+    Args:
+        name: str - имя коллекции.
+        deferred_indexing: bool - если True, построение HNSW-индекса отключено до
+                           явного включения (используется при массовой загрузке).
+    """
+    client.create_collection(
+        collection_name=name,
+        vectors_config=VectorParams(
+            size=int(os.getenv("EMB_SIZE", "512")),
+            distance=Distance.COSINE,
+        ),
+        optimizers_config=OptimizersConfigDiff(indexing_threshold=0) if deferred_indexing else None,
+    )
+
+
+def _alias_target(alias: str) -> Optional[str]:
+    """
+    Возвращает имя коллекции, на которую указывает алиас, или None, если алиаса нет.
+    """
+    for description in client.get_aliases().aliases:
+        if description.alias_name == alias:
+            return description.collection_name
+    return None
+
+
+def _docstore(version: Optional[str], create: bool = False) -> Optional[DocStore]:
+    """
+    Возвращает хранилище текстов версии коллекции или общее хранилище docstore,
+    если version не задана. Открытые хранилища кэшируются; хранилища удаленных
+    (в том числе другим процессом) версий при этом исключаются из кэша, чтобы
+    освободить отображение удаленных файлов.
+    Args:
+        version: str - имя версии коллекции или None.
+        create: bool - создать хранилище, если его нет. Иначе для отсутствующей
+                версии возвращается None.
+    """
+    if version is None:
+        return docstore
+    with version_docstores_lock:
+        for name in [name for name, store in version_docstores.items() if not os.path.isdir(store.path)]:
+            del version_docstores[name]
+        store = version_docstores.get(version)
+        path = os.path.join(docstore_root, version)
+        if store is None and (create or os.path.isdir(path)):
+            store = version_docstores[version] = DocStore(path)
+        return store
+
+
+def _drop_docstore(version: str) -> None:
+    """
+    Удаляет хранилище текстов версии коллекции.
+    """
+    with version_docstores_lock:
+        version_docstores.pop(version, None)
+    shutil.rmtree(os.path.join(docstore_root, version), ignore_errors=True)
+
+
+def _drop_root_docstore() -> None:
+    """
+    Удаляет файлы общего хранилища текстов после удаления коллекции, созданной
+    до перехода на алиасы, и открывает вместо него пустое.
+    """
+    global docstore
+    for file_name in (SEGMENT_FILE, INDEX_FILE):
+        path = os.path.join(docstore_root, file_name)
+        if os.path.exists(path):
+            os.remove(path)
+    docstore = DocStore(docstore_root)
+
+
+def _payload(item: Dict, version: Optional[str] = None) -> Dict:
+    """
+    Формирует payload точки: идентификатор страницы, версию коллекции, в хранилище
+    которой лежит текст, и, если чанк остался представителем группы дубликатов,
+    идентификаторы страниц удаленных дубликатов.
+    """
+    payload = {"ru_wiki_pageid": item["ru_wiki_pageid"]}
+    if version is not None:
+        payload[DOCSTORE_FIELD] = version
+    if item.get("alt_pageids"):
+        payload["alt_pageids"] = item["alt_pageids"]
+    return payload
+
+
+def _index_points(target: str, data: List[Dict], version: Optional[str] = None) -> int:
+    """
+    Вычисляет эмбеддинги пакетами, сохраняет тексты в хранилище версии version
+    (или в общее, если версия не задана) и загружает точки в коллекцию target.
+    Идентификаторы точек выдает хранилище, поэтому они уникальны в пределах
+    версии, а версия записывается в payload точки.
+    Returns:
+        int: Количество загруженных точек.
+    """
+    data = data[:int(os.getenv("MAX_CHUNKS")) if os.getenv("MAX_CHUNKS") else len(data)]
+    texts = [item["text"] for item in data]
+    with stage_timer("embed"):
+        vectors = model.generate_embeddings(texts, batch_size=int(os.getenv("EMB_BATCH_SIZE", "32")))
+    with stage_timer("docstore_write"):
+        ids = _docstore(version, create=True).append(texts)
+    points = [
+        PointStruct(
+            id=point_id,
+            vector=vector,
+            payload=_payload(item, version),
+        )
+        for point_id, vector, item in zip(ids, vectors, data)
+    ]
+    with stage_timer("upsert"):
+        client.upload_points(
+            collection_name=target,
+            points=points,
+            batch_size=int(os.getenv("UPSERT_BATCH_SIZE", "256")),
+            wait=True,
+        )
+    return len(points)
+
+
 def index_data(data: List[Dict]) -> None:
     """
     Индексирует список словарей, создавая векторные представления текстов и загружая их в коллекцию Qdrant.
+    Тексты чанков сохраняются в локальный docstore, в payload точек остается только ru_wiki_pageid.
     Args:
         data: Список словарей, где каждый словарь должен содержать текстовые данные для индексации.
-              Ожидается, что каждый словарь содержит ключ "text" (текст для индексации) и может
-              содержать опциональные ключи "uid" (уникальный идентификатор) и "ru_wiki_pageid"
-              (идентификатор страницы RuWiki).
+              Ожидается, что каждый словарь содержит ключи "text" (текст для индексации) и
+              "ru_wiki_pageid" (идентификатор страницы RuWiki).
 
     Exceptions:
         ValueError: Если не удается подключиться к Qdrant, создать коллекцию или выполнить индексацию,
@@ -31,35 +165,11 @@ def index_data(data: List[Dict]) -> None:
     try:
         client.get_collections()
         logger.info("Successfully connected to Qdrant.")
-        if not client.collection_exists(collection_name=collection_name):
-            client.create_collection(
-                collection_name=collection_name,
-                vectors_config=VectorParams(
-                    size=int(os.getenv("EMB_SIZE", "512")), 
-                    distance=Distance.COSINE,
-                ),
-            )
-        points = []
-        for item in data[:int(os.getenv("MAX_CHUNKS")) if os.getenv("MAX_CHUNKS") else len(data)]: # noqa E501
-            text = item["text"]
-            uid = item["uid"]
-            ru_wiki_pageid = item["ru_wiki_pageid"]
-            vector = model.generate_embedding(text)
-            point = PointStruct(
-                id=uid,
-                vector=vector,
-                payload={
-                    "text": text,
-                    "ru_wiki_pageid": ru_wiki_pageid,
-                },
-            )
-            points.append(point)
-        client.upsert(
-            collection_name=collection_name,
-            points=points,
-            wait=True
-        )
-        logger.info(f"Successfully indexed {len(points)} items to Qdrant collection '{collection_name}'.") # noqa E501
+        version = _alias_target(collection_name)
+        if version is None and not client.collection_exists(collection_name=collection_name):
+            _create_collection(collection_name)
+        count = _index_points(collection_name, data, version)
+        logger.info(f"Successfully indexed {count} items to Qdrant collection '{collection_name}'.") # noqa E501
     except ConnectionError as e:
         logger.error(f"Error creating/checking collection: {e}")
         raise ConnectionError(f"Error creating/checking collection: {e}")
@@ -68,6 +178,163 @@ def index_data(data: List[Dict]) -> None:
         raise ValueError(f"Indexing error: {e}")
 
 
+def _wait_until_indexed(name: str, count: int, threshold_kb: int) -> None:
+    """
+    Ждет, пока оптимизатор Qdrant построит HNSW-индекс коллекции. Сразу после
+    включения индексации статус еще может быть green, пока оптимизатор не начал
+    работу, поэтому статуса green недостаточно: нужно, чтобы проиндексированных
+    векторов стало не меньше count или чтобы статус побывал не green (оптимизатор
+    отработал, а небольшие сегменты меньше порога он не индексирует). Если все
+    векторы вместе меньше порога индексации, индекс не строится, и достаточно green.
+    Args:
+        name: str - имя коллекции.
+        count: int - количество загруженных точек.
+        threshold_kb: int - порог indexing_threshold в килобайтах.
+    Exceptions:
+        TimeoutError: Если индекс не построен за REINDEX_TIMEOUT секунд.
+        ValueError: Если оптимизатор завершился с ошибкой.
+    """
+    deadline = time.time() + float(os.getenv("REINDEX_TIMEOUT", "3600"))
+    vectors_kb = count * int(os.getenv("EMB_SIZE", "512")) * 4 / 1024
+    optimized = vectors_kb < threshold_kb
+    while True:
+        info = client.get_collection(collection_name=name)
+        if info.status == CollectionStatus.RED:
+            raise ValueError(f"Optimizer of collection '{name}' failed: {info.optimizer_status}")
+        if info.status != CollectionStatus.GREEN:
+            optimized = True
+        elif optimized or (info.indexed_vectors_count or 0) >= count:
+            return
+        if time.time() > deadline:
+            raise TimeoutError(f"Index of collection '{name}' was not built in time")
+        time.sleep(1)
+
+
+def _switch_alias(version: str) -> None:
+    """
+    Атомарно переключает алиас collection_name на коллекцию version.
+    Если под именем collection_name существует обычная коллекция (индекс, созданный
+    до перехода на алиасы), она удаляется вместе с общим хранилищем текстов, так как
+    алиас не может совпадать с именем коллекции. Между удалением коллекции и созданием
+    алиаса поиск по collection_name возвращает ошибку: при первом переходе на алиасы
+    переиндексация не является бесшовной.
+    """
+    operations = []
+    previous = _alias_target(collection_name)
+    legacy = previous is None and client.collection_exists(collection_name=collection_name)
+    if legacy:
+        logger.warning(
+            f"Deleting collection '{collection_name}' to replace it with an alias; "
+            "searches fail until the alias is created."
+        )
+        client.delete_collection(collection_name=collection_name)
+    if previous is not None:
+        operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=collection_name)))
+    operations.append(CreateAliasOperation(
+        create_alias=CreateAlias(collection_name=version, alias_name=collection_name),
+    ))
+    client.update_collection_aliases(change_aliases_operations=operations)
+    logger.info(f"Alias '{collection_name}' switched from '{previous}' to '{version}'.")
+    if legacy:
+        _drop_root_docstore()
+
+
+def _cleanup_versions(current: str) -> None:
+    """
+    Удаляет старые версии коллекции вместе с их хранилищами текстов, оставляя
+    REINDEX_KEEP_VERSIONS последних (помимо текущей) для отката.
+    """
+    prefix = f"{collection_name}_v"
+    versions = sorted(
+        (c.name for c in client.get_collections().collections
+         if c.name.startswith(prefix) and c.name[len(prefix):].isdigit() and c.name != current),
+        key=lambda name: int(name[len(prefix):]),
+    )
+    keep = int(os.getenv("REINDEX_KEEP_VERSIONS", "1"))
+    for name in versions[:max(0, len(versions) - keep)]:
+        client.delete_collection(collection_name=name)
+        _drop_docstore(name)
+        logger.info(f"Deleted old collection version '{name}'.")
+
+
+def _check_rebuild_size(count: int) -> None:
+    """
+    Проверяет, что новая версия не пуста и не меньше текущей более чем в
+    1 / REINDEX_MIN_RATIO раз, чтобы пустой или обрезанный источник не заменил
+    рабочий индекс.
+    Exceptions:
+        ValueError: Если новая версия пуста или слишком мала.
+    """
+    if count == 0:
+        raise ValueError("No points to index, keeping the current collection")
+    current = _alias_target(collection_name)
+    if current is None and client.collection_exists(collection_name=collection_name):
+        current = collection_name
+    if current is None:
+        return
+    current_count = client.count(collection_name=current, exact=True).count
+    min_ratio = float(os.getenv("REINDEX_MIN_RATIO", "0.5"))
+    if count < current_count * min_ratio:
+        raise ValueError(
+            f"New version has {count} points, less than {min_ratio:.0%} of {current_count} "
+            f"in '{current}', keeping the current collection"
+        )
+
+
+def rebuild_index(data: List[Dict]) -> str:
+    """
+    Полностью перестраивает индекс без остановки поиска. Данные загружаются в новую
+    версионированную коллекцию с отключенным построением HNSW-индекса, после загрузки
+    индекс строится за один проход, количество точек сверяется с загруженным, и алиас
+    collection_name, из которого читает search_data, атомарно переключается на новую версию.
+    Пустая версия или версия, в которой меньше REINDEX_MIN_RATIO точек текущей, не
+    заменяет текущую. Старые версии удаляются. Тексты каждой версии хранятся в отдельном хранилище
+    DOCSTORE_PATH/<версия> и удаляются вместе с ней.
+    Args:
+        data: Список словарей с ключами "text" и "ru_wiki_pageid".
+    Returns:
+        str: Имя новой версии коллекции.
+    Exceptions:
+        ValueError: Если данных нет, новая версия слишком мала, или ее загрузка или
+                    проверка не удалась. Алиас в этом случае не переключается, новая
+                    версия и ее тексты удаляются.
+    """
+    version = f"{collection_name}_v{int(time.time() * 1000)}"
+    try:
+        client.get_collections()
+        logger.info("Successfully connected to Qdrant.")
+        if not data:
+            raise ValueError("No points to index, keeping the current collection")
+        _create_collection(version, deferred_indexing=True)
+        try:
+            count = _index_points(version, data, version)
+            _check_rebuild_size(count)
+            threshold = int(os.getenv("HNSW_INDEXING_THRESHOLD", "20000"))
+            with stage_timer("build_index"):
+                client.update_collection(
+                    collection_name=version,
+                    optimizers_config=OptimizersConfigDiff(indexing_threshold=threshold),
+                )
+                _wait_until_indexed(version, count, threshold)
+            stored = client.count(collection_name=version, exact=True).count
+            if stored != count:
+                raise ValueError(f"Collection '{version}' has {stored} points, expected {count}")
+            _switch_alias(version)
+        except Exception:
+            client.delete_collection(collection_name=version)
+            _drop_docstore(version)
+            raise
+        _cleanup_versions(version)
+        logger.info(f"Successfully rebuilt index into '{version}' with {count} items.")
+        return version
+    except ConnectionError as e:
+        logger.error(f"Error creating/checking collection: {e}")
+        raise ConnectionError(f"Error creating/checking collection: {e}")
+    except (ValueError, TimeoutError) as e:
+        logger.error(f"Rebuild error: {e}")
+        raise ValueError(f"Rebuild error: {e}")
+
+
 def search_data(query: str) -> str:
     """
     Выполняет поиск релевантного чанка в коллекции Qdrant на основе заданного запроса.
@@ -86,15 +353,67 @@ def search_data(query: str) -> str:
         logger.info("Successfully connected to Qdrant.")
     except Exception as e:
         logger.error(f"Failed to connect to Qdrant: {e}")
-    vector = model.generate_embedding(query)
-    response = client.search(
-      collection_name=collection_name,
-      query_vector=vector,
-      limit=int(os.getenv("NUMBER_CHUNKS", "1")),
-    )
+    with stage_timer("query_embed"):
+        vector = model.generate_embedding(query)
+    with stage_timer("vector_search"):
+        response = client.search(
+          collection_name=collection_name,
+          query_vector=vector,
+          limit=int(os.getenv("NUMBER_CHUNKS", "1")),
+          with_payload=["text", DOCSTORE_FIELD],
+        )
     logger.info("Successfully taking embeddings from Qdrant.")
-    text = []
-    for point in response:
-        text.append(point.payload["text"])
-    text = " ".join(text)
+    with stage_timer("docstore_read"):
+        text = " ".join(_chunk_texts(response))
     return text
+
+
+def _chunk_texts(points: List) -> List[str]:
+    """
+    Возвращает тексты найденных точек из хранилища версии коллекции, указанной в
+    payload точки (или из общего хранилища). Для точек, проиндексированных до
+    появления docstore, текст берется из payload.
+    """
+    groups: Dict[Optional[str], List[int]] = {}
+    for i, point in enumerate(points):
+        groups.setdefault((point.payload or {}).get(DOCSTORE_FIELD), []).append(i)
+    texts: List[Optional[str]] = [None] * len(points)
+    for version, positions in groups.items():
+        store = _docstore(version)
+        if store is None:
+            continue
+        for i, text in zip(positions, store.get_many([points[i].id for i in positions])):
+            texts[i] = text
+    return [
+        text if text is not None else (point.payload or {}).get("text", "")
+        for point, text in zip(points, texts)
+    ]
+
+
+def search_data_batch(queries: List[str]) -> List[str]:
+    """
+    Выполняет поиск релевантных чанков для списка запросов: эмбеддинги всех запросов
+    вычисляются одним пакетным проходом модели, поиск выполняется одним пакетным
+    запросом к Qdrant.
+    Args:
+        queries: List[str] - поисковые запросы.
+
+    Returns:
+        List[str]: Тексты найденных чанков в том же порядке, что и queries.
+    """
+    if not queries:
+        return []
+    limit = int(os.getenv("NUMBER_CHUNKS", "1"))
+    with stage_timer("query_embed"):
+        vectors = model.generate_embeddings(queries)
+    with stage_timer("vector_search"):
+        responses = client.search_batch(
+            collection_name=collection_name,
+            requests=[
+                SearchRequest(vector=vector, limit=limit, with_payload=["text", DOCSTORE_FIELD])
+                for vector in vectors
+            ],
+        )
+    logger.info(f"Successfully taking embeddings from Qdrant for {len(queries)} queries.")
+    with stage_timer("docstore_read"):
+        return [" ".join(_chunk_texts(response)) for response in responses]
@@ -1,7 +1,10 @@
+import os
 import unicodedata
 from loguru import logger
 from llama_index.core.text_splitter import TokenTextSplitter 
 from typing import List, Dict, Any
+from common.metrics import stage_timer
+from .dedup import deduplicate, dedup_report
 
 
 def clean_and_normalize_text(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -69,7 +72,8 @@ def chunker(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
 def preprocessor(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Выполняет предобработку списка словарей, содержащих тексты. Собирает 
-    существующие функции.
+    существующие функции. После разбиения на фрагменты удаляются почти одинаковые
+    чанки с порогом сходства DEDUP_THRESHOLD (0 отключает удаление дубликатов).
     Args:
         data: Список словарей, где каждый словарь представляет собой документ и содержит
               текстовые данные.
@@ -77,6 +81,14 @@ def preprocessor(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         Список словарей, где каждый словарь представляет собой фрагмент текста после
         очистки, нормализации и разбиения на фрагменты.
     """
-    data = clean_and_normalize_text(data)
-    data = chunker(data)
+    with stage_timer("clean"):
+        data = clean_and_normalize_text(data)
+    with stage_timer("chunk"):
+        data = chunker(data)
+    threshold = float(os.getenv("DEDUP_THRESHOLD", "0.9"))
+    if os.getenv("DEDUP_REPORT"):
+        logger.info(f"Chunks dropped per dedup threshold: {dedup_report(data)}")
+    if threshold > 0:
+        with stage_timer("dedup"):
+            data = deduplicate(data, threshold=threshold)
     return data
@@ -7,4 +7,9 @@ system_prompt = """
 Ты - AI-ассистент для работы с базой данных.
 Информация из базы: {text}
 Сформулируй свой ответ пользователю.
-"""
\ No newline at end of file
+"""
+
+followup_prompt = """
+Новая информация из базы: {text}
+Вопрос пользователя: {prompt}
+"""
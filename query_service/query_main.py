@@ -1,22 +1,54 @@
 from dotenv import load_dotenv
 import os
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+import anyio
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from typing import Union, List
+from typing import Any, Iterator, Optional, Type, Union, List
 from loguru import logger
-from utils.request_to_db import request_in_base
+from utils.request_to_db import request_in_base, request_in_base_batch
 from utils.local_llm import CustomQueryLLM
-from prompts import system_prompt
+from utils.admission import AdmissionController, DeadlineExceeded, Overloaded
+from utils.sessions import Session, SessionStore
+from prompts import followup_prompt, system_prompt
+from common.metrics import ADMISSION_REJECTED, get_deadline, remaining_time, setup_metrics, stage_timer
 
 
 load_dotenv()
 model = CustomQueryLLM(
     os.getenv("QUERY_MODEL"),
     system_prompt=system_prompt,
+    followup_prompt=followup_prompt,
 )
+admission = AdmissionController(
+    max_concurrency=int(os.getenv("MAX_CONCURRENT_GENERATIONS", "1")),
+    max_queue=int(os.getenv("MAX_QUEUED_GENERATIONS", "16")),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Запросы ждут своей очереди в потоках пула FastAPI, поэтому пул должен вмещать
+    все активные и ожидающие запросы, иначе лишние запросы встанут в невидимую
+    и неограниченную очередь самого пула.
+    """
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = max(limiter.total_tokens, admission.max_concurrency + admission.max_queue + 8)
+    yield
+
+
 app = FastAPI(
     title="RAG Query Service",
     description="API for question answering with RAG pipeline",
+    lifespan=lifespan,
+)
+setup_metrics(app)
+sessions = SessionStore(
+    max_bytes=int(os.getenv("SESSION_MEMORY_MB", "512")) * 1024 * 1024,
+    ttl=float(os.getenv("SESSION_TTL", "1800")),
 )
 
 
@@ -42,6 +74,103 @@ class ApiResponse(BaseModel):
     error: str = ""
 
 
+class BatchQuery(BaseModel):
+    """
+    Модель данных для пакетного запроса на поиск.
+    Атрибуты:
+        queries: List[str] - тексты запросов пользователей.
+    """
+    queries: List[str]
+
+
+class BatchApiResponse(BaseModel):
+    """
+    Модель данных для ответа на пакетный запрос.
+    Атрибуты:
+        status: str - статус всего пакета: "success", "warning" (часть запросов не
+                выполнена) или "error" (не выполнен ни один запрос).
+        results: List[ApiResponse] - результаты по каждому запросу в исходном порядке.
+        error: str - текст ошибки, из-за которой не удалось обработать весь пакет.
+    """
+    status: str
+    results: List[ApiResponse] = []
+    error: str = ""
+
+
+class ChatQuery(BaseModel):
+    """
+    Модель данных для вопроса в рамках диалога.
+    Атрибуты:
+        query: str - текст запроса пользователя.
+        session_id: str - идентификатор диалога. Если не указан, начинается новый диалог.
+    """
+    query: str
+    session_id: Optional[str] = None
+
+
+class ChatApiResponse(ApiResponse):
+    """
+    Модель данных для ответа в рамках диалога.
+    Атрибуты:
+        session_id: str - идентификатор диалога, который нужно передать со следующим вопросом.
+    """
+    session_id: str = ""
+
+
+def check_deadline(stage: str) -> None:
+    """
+    Прерывает обработку запроса, если его крайний срок уже истек.
+    Exceptions:
+        DeadlineExceeded: Если клиент больше не ждет ответа.
+    """
+    left = remaining_time()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"Request deadline expired before {stage}")
+
+
+def rejected_response(error: Exception, response_cls: Type[BaseModel] = ApiResponse, **fields: Any) -> JSONResponse:
+    """
+    Формирует ответ на запрос, отклоненный из-за перегрузки (503 с заголовком
+    Retry-After) или истекшего крайнего срока (504), в формате модели ответа endpoint'а.
+    Args:
+        error: Exception - причина отказа (Overloaded или DeadlineExceeded).
+        response_cls: Type[BaseModel] - модель ответа endpoint'а.
+        fields: дополнительные поля ответа (например, session_id для "/chat/").
+    """
+    if isinstance(error, Overloaded):
+        status_code, headers = 503, {"Retry-After": str(error.retry_after)}
+    else:
+        status_code, headers = 504, {}
+    logger.warning(f"Request rejected: {error}")
+    response = response_cls(status="error", error=str(error), **fields)
+    return JSONResponse(status_code=status_code, content=response.model_dump(), headers=headers)
+
+
+@contextmanager
+def session_turn(session: Session) -> Iterator[None]:
+    """
+    Блокирует сессию на время одного хода диалога. Ожидание ограничено крайним
+    сроком запроса и SESSION_LOCK_TIMEOUT секундами, чтобы повторы и параллельные
+    вопросы в одном диалоге не копили заблокированные потоки в обход очереди генерации.
+    Exceptions:
+        DeadlineExceeded: Если крайний срок истек в ожидании предыдущего хода.
+        Overloaded: Если предыдущий ход не завершился за SESSION_LOCK_TIMEOUT секунд.
+    """
+    limit = float(os.getenv("SESSION_LOCK_TIMEOUT", "30"))
+    left = remaining_time()
+    timeout = limit if left is None else min(left, limit)
+    if timeout <= 0 or not session.lock.acquire(timeout=timeout):
+        if left is not None and left <= limit:
+            ADMISSION_REJECTED.labels(reason="deadline").inc()
+            raise DeadlineExceeded(f"Request deadline expired waiting for session {session.session_id}")
+        ADMISSION_REJECTED.labels(reason="session_busy").inc()
+        raise Overloaded(admission.retry_after())
+    try:
+        yield
+    finally:
+        session.lock.release()
+
+
 @app.post("/search/", response_model=ApiResponse)
 def search(query: Query):
     """
@@ -57,17 +186,145 @@ def search(query: Query):
                      сгенерированный ответ от LLM.  В случае ошибки, статус будет "error",
                      а сообщение будет содержать сообщение об ошибке, а также, опционально,
                      сообщение об ошибке в поле error.
+                     Если очередь генерации заполнена, возвращается ответ 503 с заголовком
+                     Retry-After, если истек крайний срок запроса - ответ 504. Ограничение
+                     числа одновременных генераций действует только на генерацию, поиск
+                     фрагмента выполняется до постановки в очередь.
     Exceptions:
         Функция обрабатывает исключения внутри себя и возвращает соответствующие ответы с ошибками.
         Исключения, которые не обрабатываются внутри функции, будут обработаны FastAPI.
     """
     logger.info(f"User query: {query.query}")
     try:
-        text = request_in_base(query.query)
+        check_deadline("retrieval")
+        with stage_timer("retrieve"):
+            text = request_in_base(query.query)
         logger.info("Relevant chunk successfully retrieved.")
-        response = model.generate(text=text, prompt=query.query)
-        logger.error(f"Generation is success")
+        with admission.slot(get_deadline()):
+            response = model.generate(text=text, prompt=query.query)
+        logger.info("Generation is success")
         return ApiResponse(status="success", message=response)
+    except (Overloaded, DeadlineExceeded) as e:
+        return rejected_response(e, message="Request rejected")
     except Exception as e:
         logger.error(f"Error during LLM generation: {e}")
         return ApiResponse(status="error", message="LLM generation failed", error=str(e))
+
+
+def batch_status(results: List[ApiResponse]) -> str:
+    """
+    Возвращает статус пакета по результатам отдельных запросов: "success", если
+    все запросы выполнены, "error", если ни один, и "warning" при частичной ошибке.
+    """
+    succeeded = sum(result.status == "success" for result in results)
+    if succeeded == len(results):
+        return "success"
+    return "warning" if succeeded else "error"
+
+
+@app.post("/search/batch", response_model=BatchApiResponse)
+def search_batch(item: BatchQuery):
+    """
+    Обрабатывает пакет поисковых запросов: релевантные фрагменты для всех запросов
+    получаются одним запросом к сервису индексации, ответы генерируются пакетными
+    вызовами LLM. Если пакетная генерация завершается ошибкой, ответы генерируются
+    по одному, чтобы ошибка затронула только проблемные запросы.
+    Args:
+        item: Объект BatchQuery, содержащий список поисковых запросов.
+    Returns:
+        BatchApiResponse: Результаты по каждому запросу в исходном порядке с
+                          собственным статусом и текстом ошибки; статус пакета
+                          "warning" или "error", если выполнена часть запросов или ни
+                          один. Генерация пакета
+                          занимает одно место в очереди генерации; при перегрузке или
+                          истекшем крайнем сроке возвращается ответ 503 или 504.
+    """
+    logger.info(f"Batch of {len(item.queries)} user queries")
+    try:
+        check_deadline("retrieval")
+        with stage_timer("retrieve"):
+            retrieved = request_in_base_batch(item.queries)
+    except DeadlineExceeded as e:
+        return rejected_response(e, BatchApiResponse)
+    except Exception as e:
+        logger.error(f"Error during batch retrieval: {e}")
+        results = [
+            ApiResponse(status="error", message="LLM generation failed", error=str(e))
+            for _ in item.queries
+        ]
+        return BatchApiResponse(status="error", results=results, error=str(e))
+    results = [
+        ApiResponse(status="error", message="LLM generation failed", error=chunk.get("error", ""))
+        for chunk in retrieved
+    ]
+    ready = [i for i, chunk in enumerate(retrieved) if chunk["status"] == "success"]
+    texts = [retrieved[i]["message"] for i in ready]
+    prompts = [item.queries[i] for i in ready]
+    try:
+        with admission.slot(get_deadline()):
+            generate_answers(results, ready, texts, prompts)
+    except (Overloaded, DeadlineExceeded) as e:
+        return rejected_response(e, BatchApiResponse)
+    status = batch_status(results)
+    logger.info(f"Batch generation finished with status {status}")
+    return BatchApiResponse(status=status, results=results)
+
+
+def generate_answers(results: List[ApiResponse], ready: List[int], texts: List[str], prompts: List[str]) -> None:
+    """
+    Генерирует ответы пакетом и записывает их в results на позиции ready. Если
+    пакетная генерация завершается ошибкой, ответы генерируются по одному.
+    """
+    try:
+        answers = model.generate_batch(
+            texts, prompts, batch_size=int(os.getenv("QUERY_BATCH_SIZE", "8")),
+        )
+        for i, answer in zip(ready, answers):
+            results[i] = ApiResponse(status="success", message=answer)
+    except Exception as e:
+        logger.error(f"Batch generation failed, falling back to single generation: {e}")
+        for i, text, prompt in zip(ready, texts, prompts):
+            try:
+                results[i] = ApiResponse(status="success", message=model.generate(text=text, prompt=prompt))
+            except Exception as item_error:
+                results[i] = ApiResponse(status="error", message="LLM generation failed", error=str(item_error))
+
+
+@app.post("/chat/", response_model=ChatApiResponse)
+def chat(query: ChatQuery):
+    """
+    Обрабатывает вопрос в рамках диалога. Релевантный фрагмент ищется по тексту
+    вопроса, как в "/search/", но ответ генерируется с учетом истории диалога, а
+    past key/values предыдущих ходов берутся из кэша сессии, так что prefill
+    выполняется только для нового контекста и вопроса.
+    Args:
+        query: Объект ChatQuery с вопросом и идентификатором диалога.
+    Returns:
+        ChatApiResponse: Ответ модели и идентификатор диалога. Если сессия не найдена
+                         (истекла или вытеснена), начинается новый диалог с тем же
+                         идентификатором. При перегрузке или истекшем крайнем сроке
+                         возвращается ответ 503 или 504, в котором тоже передается
+                         идентификатор диалога.
+    """
+    session_id = query.session_id or uuid.uuid4().hex
+    logger.info(f"Session {session_id} query: {query.query}")
+    try:
+        check_deadline("retrieval")
+        with stage_timer("retrieve"):
+            text = request_in_base(query.query)
+        logger.info("Relevant chunk successfully retrieved.")
+        session = sessions.get(session_id)
+        # Слот генерации берется после блокировки сессии, чтобы следующий ход того же
+        # диалога не занимал слот, пока ждет окончания предыдущего.
+        with session_turn(session), admission.slot(get_deadline()):
+            response = model.chat(session, text=text, prompt=query.query)
+            sessions.put(session)
+        logger.info("Generation is success")
+        return ChatApiResponse(status="success", message=response, session_id=session_id)
+    except (Overloaded, DeadlineExceeded) as e:
+        return rejected_response(e, ChatApiResponse, message="Request rejected", session_id=session_id)
+    except Exception as e:
+        logger.error(f"Error during LLM generation: {e}")
+        return ChatApiResponse(
+            status="error", message="LLM generation failed", error=str(e), session_id=session_id,
+        )
@@ -0,0 +1,105 @@
+"""
+Ограничение числа одновременных генераций (admission control).
+
+Одновременно выполняется не больше max_concurrency запросов, еще не больше
+max_queue ждут в очереди. Если очередь заполнена, запрос сразу отклоняется с
+рекомендацией повторить через retry_after секунд; запрос, крайний срок которого
+истек во время ожидания, из очереди удаляется. Глубина очереди, число активных
+запросов, время ожидания и отказы публикуются в метриках.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from common.metrics import (
+    ADMISSION_ACTIVE,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_REJECTED,
+    ADMISSION_WAIT,
+)
+
+
+class Overloaded(Exception):
+    """
+    Очередь заполнена. Атрибут retry_after - рекомендуемая пауза в секундах.
+    """
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"Service is overloaded, retry after {retry_after} s")
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """
+    Крайний срок запроса истек до начала или во время обработки.
+    """
+
+
+class AdmissionController():
+    """
+    Семафор с ограниченной очередью ожидания и учетом крайних сроков запросов.
+    """
+    def __init__(self, max_concurrency: int, max_queue: int) -> None:
+        """
+        Args:
+            max_concurrency: int - максимальное число одновременно выполняемых запросов.
+            max_queue: int - максимальное число запросов, ожидающих в очереди.
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.active = 0
+        self.waiting = 0
+        self._service_time = 1.0
+        self._condition = threading.Condition()
+
+    def retry_after(self) -> int:
+        """
+        Оценивает, через сколько секунд освободится место: время обслуживания
+        (скользящее среднее) умножается на число запросов впереди на один слот.
+        """
+        return max(1, math.ceil(self._service_time * (self.waiting + 1) / self.max_concurrency))
+
+    @contextmanager
+    def slot(self, deadline: Optional[float] = None) -> Iterator[None]:
+        """
+        Занимает слот на время выполнения блока.
+        Args:
+            deadline: float - крайний срок запроса (unix-время) или None.
+        Exceptions:
+            Overloaded: Если все слоты заняты и очередь заполнена.
+            DeadlineExceeded: Если крайний срок истек до получения слота.
+        """
+        start = time.time()
+        with self._condition:
+            if deadline is not None and deadline <= start:
+                ADMISSION_REJECTED.labels(reason="deadline").inc()
+                raise DeadlineExceeded("Request deadline expired before admission")
+            if self.active >= self.max_concurrency:
+                if self.waiting >= self.max_queue:
+                    ADMISSION_REJECTED.labels(reason="queue_full").inc()
+                    raise Overloaded(self.retry_after())
+                self.waiting += 1
+                ADMISSION_QUEUE_DEPTH.inc()
+                try:
+                    while self.active >= self.max_concurrency:
+                        timeout = None if deadline is None else deadline - time.time()
+                        if timeout is not None and timeout <= 0:
+                            ADMISSION_REJECTED.labels(reason="deadline").inc()
+                            raise DeadlineExceeded("Request deadline expired in the queue")
+                        self._condition.wait(timeout)
+                finally:
+                    self.waiting -= 1
+                    ADMISSION_QUEUE_DEPTH.dec()
+            self.active += 1
+            ADMISSION_ACTIVE.inc()
+        admitted = time.time()
+        ADMISSION_WAIT.observe(admitted - start)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.active -= 1
+                ADMISSION_ACTIVE.dec()
+                self._service_time = 0.8 * self._service_time + 0.2 * (time.time() - admitted)
+                self._condition.notify()
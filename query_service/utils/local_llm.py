@@ -1,11 +1,58 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from transformers import AutoModelForCausalLM, AutoTokenizer, DynamicCache
+from transformers.generation.streamers import BaseStreamer
 from dotenv import load_dotenv
 from loguru import logger
+import time
 import torch
+from typing import List
+from common.metrics import (
+    CACHE_HITS,
+    CACHE_MISSES,
+    GENERATED_TOKENS,
+    PREFILL_SAVED,
+    observe_stage,
+    stage_timer,
+)
+from .sessions import Session, common_prefix_length
 
 load_dotenv()
 
 
+class GenerationTimer(BaseStreamer):
+    """
+    Стример, разделяющий время генерации на prefill и decode.
+    Первый вызов put() получает токены промпта, второй - первый сгенерированный
+    токен, то есть момент окончания prefill.
+    """
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.first_token_time = None
+        self._prompt_received = False
+
+    def put(self, value) -> None:
+        if not self._prompt_received:
+            self._prompt_received = True
+        elif self.first_token_time is None:
+            self.first_token_time = time.perf_counter()
+
+    def end(self) -> None:
+        pass
+
+    def observe(self) -> float:
+        """
+        Записывает длительности prefill и decode в метрики.
+        Returns:
+            float: Длительность prefill в секундах.
+        """
+        finish = time.perf_counter()
+        if self.first_token_time is None:
+            observe_stage("prefill", finish - self.start)
+            return finish - self.start
+        observe_stage("prefill", self.first_token_time - self.start)
+        observe_stage("decode", finish - self.first_token_time)
+        return self.first_token_time - self.start
+
+
 class CustomQueryLLM():
     """
     Класс, реализующий генерацию текста на основе запроса с использованием
@@ -19,6 +66,8 @@ class CustomQueryLLM():
         model_name: str,
         system_prompt: str,
         torch_dtype = "FLOAT16",
+        max_new_tokens: int = 32768,
+        followup_prompt: str = "Информация из базы: {text}\n{prompt}",
     ) -> None:
         """
         Инициализирует экземпляр CustomQueryLLM.
@@ -32,6 +81,9 @@ class CustomQueryLLM():
             torch_dtype: str - тип данных torch, который нужно использовать для
                          загрузки модели. Может быть "FLOAT32" или "FLOAT16".
                          По умолчанию используется "FLOAT16".
+            max_new_tokens: int - максимальное количество генерируемых токенов.
+            followup_prompt: str - шаблон сообщения пользователя для следующих ходов
+                             диалога, с полями `{text}` (новый чанк) и `{prompt}` (вопрос).
         """
         self.model_name = model_name
         self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
@@ -42,6 +94,29 @@ class CustomQueryLLM():
             device_map="auto",
         )
         self.system_prompt = system_prompt
+        self.followup_prompt = followup_prompt
+        self.max_new_tokens = max_new_tokens
+
+    def build_prompt(self, text: str, prompt: str) -> str:
+        """
+        Формирует полный промпт по chat-шаблону модели из системного промпта,
+        контекстного текста и запроса пользователя.
+        Args:
+            text: str - контекстный текст.
+            prompt: str - запрос пользователя.
+        Returns:
+            str: Промпт, готовый к токенизации.
+        """
+        messages = [
+            {"role": "system", "content": self.system_prompt.format(text=text)},
+            {"role": "user", "content": prompt}
+        ]
+        return self.tokenizer.apply_chat_template(
+            messages,
+            tokenize=False,
+            add_generation_prompt=True,
+            enable_thinking=False
+        )
 
     def generate(self, text: str, prompt: str) -> str:
         """
@@ -58,19 +133,152 @@ class CustomQueryLLM():
             str: Сгенерированный текст, основанный на предоставленном контексте и запросе.
         """
         logger.info(f"Returned chunk: {text}")
-        messages = [
-            {"role": "system", "content": self.system_prompt.format(text=text)},
-            {"role": "user", "content": prompt}
-        ]
-        text = self.tokenizer.apply_chat_template(
-            messages,
-            tokenize=False,
-            add_generation_prompt=True,
-            enable_thinking=False
-        )
-        logger.info(f"Final prompt: {text}")
-        model_inputs = self.tokenizer([text], return_tensors="pt").to(self.model.device) # noqa E501
-        response_ids = self.model.generate(**model_inputs, max_new_tokens=32768)[0][len(model_inputs.input_ids[0]):].tolist() # noqa E501
+        with stage_timer("prompt_build"):
+            text = self.build_prompt(text=text, prompt=prompt)
+            logger.info(f"Final prompt: {text}")
+            model_inputs = self.tokenizer([text], return_tensors="pt").to(self.model.device) # noqa E501
+        timer = GenerationTimer()
+        response_ids = self.model.generate(**model_inputs, max_new_tokens=self.max_new_tokens, streamer=timer)[0][len(model_inputs.input_ids[0]):].tolist() # noqa E501
+        timer.observe()
+        GENERATED_TOKENS.inc(len(response_ids))
+        response = self.tokenizer.decode(response_ids, skip_special_tokens=True) # noqa E501
+        logger.info(f"Model answer: {response}")
+        return response
+
+    def chat(self, session: Session, text: str, prompt: str) -> str:
+        """
+        Генерирует ответ на очередной вопрос диалога, переиспользуя past key/values
+        предыдущих ходов. Первый ход формируется как в generate, следующие добавляют
+        к истории сообщение пользователя с новым контекстом по шаблону followup_prompt.
+        Для кэшированной части диалога (общего начала токенов истории и нового
+        промпта) prefill не выполняется. Сессия обновляется на месте только после
+        успешной генерации; если генерация завершилась ошибкой, история сообщений
+        не меняется, а кэш сессии сбрасывается, так как generate мог успеть изменить его.
+        Args:
+            session: Session - сессия диалога.
+            text: str - контекстный текст для текущего вопроса.
+            prompt: str - вопрос пользователя.
+        Returns:
+            str: Сгенерированный ответ.
+        """
+        if session.messages:
+            message = self.followup_prompt.format(text=text, prompt=prompt)
+            messages = session.messages + [{"role": "user", "content": message}]
+        else:
+            messages = [
+                {"role": "system", "content": self.system_prompt.format(text=text)},
+                {"role": "user", "content": prompt},
+            ]
+        with stage_timer("prompt_build"):
+            prompt_text = self.tokenizer.apply_chat_template(
+                messages,
+                tokenize=False,
+                add_generation_prompt=True,
+                enable_thinking=False
+            )
+            input_ids = self.tokenizer([prompt_text], return_tensors="pt").input_ids.to(self.model.device) # noqa E501
+        prompt_length = input_ids.shape[1]
+        reused = 0
+        # Кэш изменяется на месте (crop и generate), поэтому до успешной генерации он
+        # забирается из сессии.
+        cache, token_ids = session.cache, session.token_ids
+        session.cache, session.token_ids = None, []
+        if cache is not None:
+            # Последний токен промпта всегда обрабатывается заново: с него начинается генерация.
+            reused = min(
+                common_prefix_length(token_ids, input_ids[0].tolist()),
+                cache.get_seq_length(),
+                prompt_length - 1,
+            )
+        if reused > 0:
+            cache.crop(reused)
+            CACHE_HITS.labels(cache="session").inc()
+        else:
+            cache = DynamicCache()
+            CACHE_MISSES.labels(cache="session").inc()
+        timer = GenerationTimer()
+        output_ids = self.model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            past_key_values=cache,
+            max_new_tokens=self.max_new_tokens,
+            streamer=timer,
+        )[0]
+        prefill = timer.observe()
+        if reused > 0:
+            saved = prefill / (prompt_length - reused) * reused
+            PREFILL_SAVED.observe(saved)
+            logger.info(
+                f"Session {session.session_id}: reused {reused} of {prompt_length} prompt tokens, "
+                f"prefill {prefill:.3f} s, estimated {saved:.3f} s saved"
+            )
+        response_ids = output_ids[prompt_length:].tolist()
+        GENERATED_TOKENS.inc(len(response_ids))
         response = self.tokenizer.decode(response_ids, skip_special_tokens=True) # noqa E501
+        session.messages = messages + [{"role": "assistant", "content": response}]
+        session.token_ids = output_ids.tolist()
+        session.cache = cache
         logger.info(f"Model answer: {response}")
         return response
+
+    def count_generated_tokens(self, response_ids: torch.Tensor) -> int:
+        """
+        Считает сгенерированные токены пакета так же, как generate: в каждой строке
+        до первого EOS включительно. Паддинг после EOS не учитывается, даже если
+        pad_token совпадает с eos_token.
+        Args:
+            response_ids: torch.Tensor - сгенерированные токены пакета без промптов.
+        Returns:
+            int: Количество сгенерированных токенов.
+        """
+        eos_ids = []
+        for value in (self.tokenizer.eos_token_id, self.model.generation_config.eos_token_id):
+            values = value if isinstance(value, (list, tuple)) else [value]
+            eos_ids.extend(v for v in values if isinstance(v, int))
+        if not eos_ids:
+            return response_ids.numel()
+        is_eos = torch.isin(response_ids, torch.tensor(eos_ids, device=response_ids.device))
+        lengths = torch.where(
+            is_eos.any(dim=1),
+            is_eos.int().argmax(dim=1) + 1,
+            torch.full_like(is_eos[:, 0], response_ids.shape[1], dtype=torch.long),
+        )
+        return int(lengths.sum())
+
+    def generate_batch(self, texts: List[str], prompts: List[str], batch_size: int = 8) -> List[str]:
+        """
+        Генерирует ответы для нескольких пар (контекст, запрос) пакетными вызовами
+        model.generate. Промпты дополняются паддингом слева, чтобы генерация всех
+        строк пакета начиналась с одной позиции.
+        Args:
+            texts: List[str] - контекстные тексты.
+            prompts: List[str] - запросы пользователей, по одному на каждый текст.
+            batch_size: int - количество промптов в одном вызове model.generate.
+        Returns:
+            List[str]: Сгенерированные ответы в том же порядке, что и prompts.
+        """
+        if len(texts) != len(prompts):
+            raise ValueError("texts and prompts must have the same length")
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        responses = []
+        for start in range(0, len(prompts), batch_size):
+            with stage_timer("prompt_build"):
+                batch = [
+                    self.build_prompt(text=text, prompt=prompt)
+                    for text, prompt in zip(texts[start:start + batch_size], prompts[start:start + batch_size])
+                ]
+                model_inputs = self.tokenizer(
+                    batch, return_tensors="pt", padding=True, padding_side="left",
+                ).to(self.model.device)
+            with stage_timer("batch_generate"):
+                output_ids = self.model.generate(
+                    **model_inputs,
+                    max_new_tokens=self.max_new_tokens,
+                    pad_token_id=self.tokenizer.pad_token_id,
+                )
+            response_ids = output_ids[:, model_inputs.input_ids.shape[1]:]
+            GENERATED_TOKENS.inc(self.count_generated_tokens(response_ids))
+            responses.extend(self.tokenizer.batch_decode(response_ids, skip_special_tokens=True))
+        logger.info(f"Generated {len(responses)} answers in batches of {batch_size}")
+        return responses
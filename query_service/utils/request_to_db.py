@@ -3,10 +3,26 @@ from requests import HTTPError
 from loguru import logger
 import os
 from dotenv import load_dotenv
+from typing import Dict, List, Optional
+from common.metrics import remaining_time, request_headers
+from .admission import DeadlineExceeded
 
 load_dotenv()
 
 
+def retrieval_timeout() -> Optional[float]:
+        """
+        Возвращает таймаут запроса к сервису индексации: время до крайнего срока
+        запроса или None, если крайний срок не задан.
+        Exceptions:
+            DeadlineExceeded: Если крайний срок уже истек.
+        """
+        timeout = remaining_time()
+        if timeout is not None and timeout <= 0:
+            raise DeadlineExceeded("Request deadline expired before retrieval")
+        return timeout
+
+
 def request_in_base(request: str) -> str:
         """
         Эта функция отправляет POST-запрос к эндпоинту "/search/" сервиса индексации,
@@ -16,20 +32,61 @@ def request_in_base(request: str) -> str:
             request: str - поисковый запрос, который нужно отправить в сервис индексации.
         Returns:
             text: str - релевантный фрагмент текста, полученный от сервиса индексации.
+        Exceptions:
+            DeadlineExceeded: Если крайний срок запроса истек до ответа сервиса индексации.
         """
+        timeout = retrieval_timeout()
         try:
             response = requests.post(
                 url=f"http://{os.getenv('INDEXING_SERVICE')}:{os.getenv('INDEXING_PORT')}/search/",
                 json={"query": request},
-                headers={"Content-Type": "application/json"},
+                headers=request_headers(),
+                timeout=timeout,
             )
             response.raise_for_status()
             text = response.json()["message"]
             logger.info("Relevant chunk returned success")
             return text
+        except requests.exceptions.Timeout as e:
+            logger.error(f"Indexing service did not respond before the deadline: {e}")
+            raise DeadlineExceeded(f"Indexing service did not respond within {timeout:.1f} s")
         except HTTPError as e:
             logger.error(f"HTTPError {e}")
             raise HTTPError(f"HTTPError {e}")
         except Exception as e:
             logger.error(f"Relevant chunk didn't return {e}")
             raise ValueError(f"Relevant chunk didn't return {e}")
+
+
+def request_in_base_batch(requests_list: List[str]) -> List[Dict[str, str]]:
+        """
+        Отправляет пакет поисковых запросов к эндпоинту "/search/batch" сервиса индексации.
+        Args:
+            requests_list: List[str] - поисковые запросы.
+        Returns:
+            List[Dict[str, str]]: Результаты по каждому запросу в исходном порядке: словари
+                                  с ключами "status", "message" (найденный фрагмент) и "error".
+        Exceptions:
+            DeadlineExceeded: Если крайний срок запроса истек до ответа сервиса индексации.
+        """
+        timeout = retrieval_timeout()
+        try:
+            response = requests.post(
+                url=f"http://{os.getenv('INDEXING_SERVICE')}:{os.getenv('INDEXING_PORT')}/search/batch",
+                json={"queries": requests_list},
+                headers=request_headers(),
+                timeout=timeout,
+            )
+            response.raise_for_status()
+            results = response.json()["results"]
+            logger.info(f"Relevant chunks returned for {len(results)} queries")
+            return results
+        except requests.exceptions.Timeout as e:
+            logger.error(f"Indexing service did not respond before the deadline: {e}")
+            raise DeadlineExceeded(f"Indexing service did not respond within {timeout:.1f} s")
+        except HTTPError as e:
+            logger.error(f"HTTPError {e}")
+            raise HTTPError(f"HTTPError {e}")
+        except Exception as e:
+            logger.error(f"Relevant chunks didn't return {e}")
+            raise ValueError(f"Relevant chunks didn't return {e}")
@@ -0,0 +1,137 @@
+"""
+Хранилище диалоговых сессий сервиса поиска.
+
+Сессия хранит историю сообщений, токены уже обработанной моделью части диалога
+и их past key/values, чтобы следующий вопрос в том же диалоге требовал prefill
+только нового контекста и сообщения пользователя. Сессии хранятся в памяти
+процесса: при запуске в несколько процессов каждая сессия живет в том процессе,
+который ее создал.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List
+from loguru import logger
+from common.metrics import SESSION_CACHE_BYTES
+
+
+def cache_nbytes(cache: Any) -> int:
+    """
+    Считает объем памяти, занимаемый тензорами key/value кэша модели.
+    Args:
+        cache: Кэш transformers (например, DynamicCache) или None.
+    Returns:
+        int: Объем памяти в байтах.
+    """
+    if cache is None:
+        return 0
+    return sum(
+        tensor.numel() * tensor.element_size()
+        for layer in cache.to_legacy_cache()
+        for tensor in layer
+    )
+
+
+def common_prefix_length(first: List[int], second: List[int]) -> int:
+    """
+    Возвращает длину общего начала двух последовательностей токенов.
+    """
+    length = 0
+    for a, b in zip(first, second):
+        if a != b:
+            break
+        length += 1
+    return length
+
+
+class Session():
+    """
+    Состояние одного диалога.
+    Атрибуты:
+        session_id: str - идентификатор сессии.
+        messages: List[Dict[str, str]] - история сообщений в формате chat-шаблона.
+        token_ids: List[int] - токены диалога, для которых посчитан cache.
+        cache: past key/values модели или None.
+        nbytes: int - объем памяти кэша, учтенный в хранилище.
+        last_used: float - время последнего обращения (unix-время).
+        lock: threading.Lock - блокировка, не дающая обрабатывать два хода одного
+              диалога одновременно.
+    """
+    def __init__(self, session_id: str) -> None:
+        self.session_id = session_id
+        self.messages: List[Dict[str, str]] = []
+        self.token_ids: List[int] = []
+        self.cache = None
+        self.nbytes = 0
+        self.last_used = time.time()
+        self.lock = threading.Lock()
+
+
+class SessionStore():
+    """
+    Хранилище сессий с вытеснением давно неиспользуемых (LRU) при превышении
+    бюджета памяти и удалением сессий, к которым не обращались дольше ttl секунд.
+    """
+    def __init__(self, max_bytes: int, ttl: float) -> None:
+        """
+        Args:
+            max_bytes: int - суммарный бюджет памяти на кэши всех сессий в байтах.
+            ttl: float - время жизни сессии без обращений в секундах.
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.nbytes = 0
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def get(self, session_id: str) -> Session:
+        """
+        Возвращает сессию по идентификатору или новую пустую сессию, если такой нет
+        или она истекла. Новая сессия попадает в хранилище только после put().
+        """
+        with self._lock:
+            self._expire(time.time())
+            session = self._sessions.get(session_id)
+            if session is None:
+                return Session(session_id)
+            self._sessions.move_to_end(session_id)
+            session.last_used = time.time()
+            return session
+
+    def put(self, session: Session) -> None:
+        """
+        Сохраняет сессию после очередного хода диалога, пересчитывает занятую
+        память и вытесняет сессии, не помещающиеся в бюджет.
+        """
+        nbytes = cache_nbytes(session.cache)
+        with self._lock:
+            if session.session_id in self._sessions:
+                self._remove(session.session_id)
+            session.nbytes = nbytes
+            session.last_used = time.time()
+            self._sessions[session.session_id] = session
+            self.nbytes += nbytes
+            self._expire(session.last_used)
+            while self.nbytes > self.max_bytes and self._sessions:
+                session_id = next(iter(self._sessions))
+                logger.info(f"Session {session_id} evicted to fit the memory budget")
+                self._remove(session_id)
+            SESSION_CACHE_BYTES.set(self.nbytes)
+
+    def _expire(self, now: float) -> None:
+        expired = [sid for sid, s in self._sessions.items() if now - s.last_used > self.ttl]
+        for session_id in expired:
+            logger.info(f"Session {session_id} expired")
+            self._remove(session_id)
+        if expired:
+            SESSION_CACHE_BYTES.set(self.nbytes)
+
+    def _remove(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id)
+        self.nbytes -= session.nbytes
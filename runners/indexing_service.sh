@@ -1,4 +1,4 @@
 #!/bin/bash
 
 echo "Starting indexing service..."
-uvicorn indexing_main:app --host ${INDEXING_HOST} --port ${INDEXING_PORT} 
\ No newline at end of file
+python -m common.prefork indexing_main:app --host ${INDEXING_HOST} --port ${INDEXING_PORT} --workers ${INDEXING_WORKERS:-1}
@@ -1,4 +1,4 @@
 #!/bin/bash
 
 echo "Starting query service..."
-uvicorn query_main:app --host ${QUERY_HOST} --port ${QUERY_PORT} 
\ No newline at end of file
+python -m common.prefork query_main:app --host ${QUERY_HOST} --port ${QUERY_PORT} --workers ${QUERY_WORKERS:-1}
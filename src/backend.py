@@ -1,15 +1,19 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 import requests
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import os
-from typing import List, Union
+import time
+from typing import Any, Dict, List, Optional, Type, Union
+from common.metrics import setup_metrics, request_deadline, request_headers
 
 load_dotenv()
 app = FastAPI(
     title="Backend service",
     description="API for routing requests between services",
 )
+setup_metrics(app)
 
 
 class UrlObject(BaseModel):
@@ -17,8 +21,12 @@ class UrlObject(BaseModel):
     Модель данных для URL, используемая для валидации входных данных.
     Атрибуты:
         url: str - URL для индексации.
+        sources: List[str] - несколько источников для индексации: HTTP(S) URL и пути
+                 к локальным файлам в сервисе индексации. Если указаны, поле url
+                 не используется.
     """
-    url : str
+    url : str = ""
+    sources: List[str] = []
 
 
 class Query(BaseModel):
@@ -43,19 +51,147 @@ class ApiResponse(BaseModel):
     error: str = ""
 
 
-@app.post("/indexing/", response_model=ApiResponse)
+class SourceStatus(BaseModel):
+    """
+    Модель данных для результата загрузки одного источника.
+    Атрибуты:
+        source: str - URL или путь к файлу.
+        status: str - "success" или "error".
+        records: int - количество загруженных записей.
+        error: str - текст ошибки загрузки.
+    """
+    source: str
+    status: str
+    records: int = 0
+    error: str = ""
+
+
+class IndexingApiResponse(ApiResponse):
+    """
+    Модель данных для ответа на запрос индексации.
+    Атрибуты:
+        sources: List[SourceStatus] - результаты загрузки по каждому источнику.
+    """
+    sources: List[SourceStatus] = []
+
+
+class ChatQuery(BaseModel):
+    """
+    Модель данных для вопроса в рамках диалога.
+    Атрибуты:
+        query: str - текст запроса пользователя.
+        session_id: str - идентификатор диалога. Если не указан, начинается новый диалог.
+    """
+    query: str
+    session_id: Optional[str] = None
+
+
+class ChatApiResponse(ApiResponse):
+    """
+    Модель данных для ответа в рамках диалога.
+    Атрибуты:
+        session_id: str - идентификатор диалога, который нужно передать со следующим вопросом.
+    """
+    session_id: str = ""
+
+
+class BatchQuery(BaseModel):
+    """
+    Модель данных для пакетного запроса на поиск.
+    Атрибуты:
+        queries: List[str] - тексты запросов пользователей.
+    """
+    queries: List[str]
+
+
+class BatchApiResponse(BaseModel):
+    """
+    Модель данных для ответа на пакетный запрос.
+    Атрибуты:
+        status: str - статус всего пакета: "success", "warning" (часть запросов не
+                выполнена) или "error" (не выполнен ни один запрос).
+        results: List[ApiResponse] - результаты по каждому запросу в исходном порядке.
+        error: str - текст ошибки, из-за которой не удалось обработать весь пакет.
+    """
+    status: str
+    results: List[ApiResponse] = []
+    error: str = ""
+
+
+def deadline_response(response_cls: Type[BaseModel], error: str) -> JSONResponse:
+    """
+    Формирует ответ 504 в формате модели ответа endpoint'а.
+    """
+    return JSONResponse(status_code=504, content=response_cls(status="error", error=error).model_dump())
+
+
+def call_query_service(
+    path: str, payload: Dict[str, Any], response_cls: Type[BaseModel],
+) -> Union[Dict[str, Any], JSONResponse]:
+    """
+    Отправляет запрос в сервис поиска с крайним сроком REQUEST_TIMEOUT секунд (или
+    раньше, если клиент передал свой крайний срок в заголовке X-Request-Deadline).
+    Крайний срок передается в сервис поиска, чтобы тот не тратил время на запросы,
+    ответ на которые уже никто не ждет.
+    Args:
+        path: str - путь endpoint'а сервиса поиска.
+        payload: Dict[str, Any] - тело запроса.
+        response_cls: Type[BaseModel] - модель ответа endpoint'а бэкенда, в формате
+                      которой возвращается ответ 504.
+    Returns:
+        Union[Dict[str, Any], JSONResponse]: Тело успешного ответа сервиса поиска или
+            готовый ответ клиенту: 504, если крайний срок истек до запроса или сервис
+            поиска не ответил вовремя, либо отказ сервиса поиска (503, 504).
+    Exceptions:
+        HTTPError: Если сервис поиска вернул другую ошибку.
+    """
+    deadline = request_deadline(float(os.getenv("REQUEST_TIMEOUT", "60")))
+    timeout = deadline - time.time()
+    if timeout <= 0:
+        return deadline_response(response_cls, "Request deadline expired")
+    try:
+        response = requests.post(
+            url=f"http://{os.getenv('QUERY_SERVICE')}:{os.getenv('QUERY_PORT')}{path}",
+            json=payload,
+            headers=request_headers(deadline),
+            timeout=timeout,
+        )
+    except requests.exceptions.Timeout:
+        return deadline_response(response_cls, f"Query service did not respond within {timeout:.1f} s")
+    rejected = rejected_response(response)
+    if rejected is not None:
+        return rejected
+    response.raise_for_status()
+    return response.json()
+
+
+def rejected_response(response: requests.Response) -> Optional[JSONResponse]:
+    """
+    Передает клиенту отказ сервиса поиска из-за перегрузки (429, 503) или истекшего
+    крайнего срока (504) вместе с заголовком Retry-After, чтобы клиент мог повторить
+    запрос позже. Для остальных ответов возвращает None.
+    """
+    if response.status_code not in (429, 503, 504):
+        return None
+    headers = {}
+    if "Retry-After" in response.headers:
+        headers["Retry-After"] = response.headers["Retry-After"]
+    return JSONResponse(status_code=response.status_code, content=response.json(), headers=headers)
+
+
+@app.post("/indexing/", response_model=IndexingApiResponse)
 def add_to_base(data_url: UrlObject):
     """
-    Отправляет URL для индексации в сервис индексирования.
+    Отправляет URL или список источников для индексации в сервис индексирования.
     Эта функция обрабатывает POST-запросы к endpoint "/indexing/". Она извлекает URL из тела запроса,
     отправляет его в сервис индексирования и возвращает ответ от этого сервиса.
     Args:
-        data_url: Объект UrlObject, содержащий URL для индексации. Этот объект создается с помощью
-                  валидации Pydantic.
+        data_url: Объект UrlObject, содержащий URL или источники для индексации. Этот объект
+                  создается с помощью валидации Pydantic.
     Returns:
-        ApiResponse:   Объект ApiResponse, содержащий статус и сообщение ответа от сервиса индексирования.
-                       В случае успеха, статус будет "success", а сообщение будет содержать результат
-                       индексации. В случае ошибки, функция поднимает исключение HTTPException.
+        IndexingApiResponse: Объект, содержащий статус, сообщение ответа от сервиса индексирования
+                       и статус загрузки каждого источника. В случае ошибки запроса к сервису
+                       функция поднимает исключение HTTPException.
     Exceptions:
         HTTPException: Если запрос к сервису индексирования завершается с ошибкой (например,
                        из-за недоступности сервиса или проблем с сетью), функция поднимает
@@ -64,12 +200,32 @@ def add_to_base(data_url: UrlObject):
     """
     response = requests.post(
         url=f"http://{os.getenv('INDEXING_SERVICE')}:{os.getenv('INDEXING_PORT')}/indexing/",
-        json={"url": data_url.url},
-        headers={"Content-Type": "application/json"},
+        json={"url": data_url.url, "sources": data_url.sources},
+        headers=request_headers(),
+    )
+    response.raise_for_status()
+    return IndexingApiResponse(**response.json())
+
+
+@app.post("/indexing/rebuild/", response_model=IndexingApiResponse)
+def rebuild_base(data_url: UrlObject):
+    """
+    Отправляет URL в сервис индексирования для полной переиндексации без остановки поиска.
+    Args:
+        data_url: Объект UrlObject, содержащий URL или источники данных для индексации.
+    Returns:
+        IndexingApiResponse: Объект со статусом и сообщением от сервиса индексирования и
+                             статусом загрузки каждого источника.
+    Exceptions:
+        HTTPException: Если запрос к сервису индексирования завершается с ошибкой.
+    """
+    response = requests.post(
+        url=f"http://{os.getenv('INDEXING_SERVICE')}:{os.getenv('INDEXING_PORT')}/indexing/rebuild/",
+        json={"url": data_url.url, "sources": data_url.sources},
+        headers=request_headers(),
     )
     response.raise_for_status()
-    res = response.json()["message"]
-    return ApiResponse(status="success", message=res)
+    return IndexingApiResponse(**response.json())
 
 
 @app.post("/search/", response_model=ApiResponse)
@@ -85,17 +241,57 @@ def add_to_base(query: Query):
         ApiResponse: Объект ApiResponse, содержащий статус и сообщение ответа от сервиса поиска.
                      В случае успеха, статус будет "success", а сообщение будет содержать
                      результаты поиска. В случае ошибки, функция поднимает исключение HTTPException.
+                     Отказы сервиса поиска из-за перегрузки (503 с Retry-After) и истекшего
+                     крайнего срока (504) передаются клиенту без изменений; если крайний
+                     срок истек до запроса или сервис поиска не ответил вовремя, возвращается 504.
     Exception:
         HTTPException: Если запрос к сервису поиска завершается с ошибкой (например,
                        из-за недоступности сервиса или проблем с сетью), функция поднимает
                        исключение HTTPException с соответствующим кодом состояния и
                        деталями ошибки.
     """
-    response = requests.post(
-        url=f"http://{os.getenv('QUERY_SERVICE')}:{os.getenv('QUERY_PORT')}/search/",
-        json={"query": query.query},
-        headers={"Content-Type": "application/json"},
+    response = call_query_service("/search/", {"query": query.query}, ApiResponse)
+    if isinstance(response, JSONResponse):
+        return response
+    return ApiResponse(status="success", message=response["message"])
+
+
+@app.post("/search/batch", response_model=BatchApiResponse)
+def search_batch(batch: BatchQuery):
+    """
+    Отправляет пакет поисковых запросов в сервис поиска.
+    Args:
+        batch: Объект BatchQuery, содержащий список поисковых запросов.
+    Returns:
+        BatchApiResponse: Результаты по каждому запросу в исходном порядке, каждый со
+                          своим статусом и текстом ошибки. Отказы сервиса поиска
+                          (503, 504) передаются клиенту без изменений, при истекшем
+                          крайнем сроке возвращается 504.
+    Exception:
+        HTTPException: Если запрос к сервису поиска завершается с ошибкой.
+    """
+    response = call_query_service("/search/batch", {"queries": batch.queries}, BatchApiResponse)
+    if isinstance(response, JSONResponse):
+        return response
+    return BatchApiResponse(**response)
+
+
+@app.post("/chat/", response_model=ChatApiResponse)
+def chat(query: ChatQuery):
+    """
+    Отправляет вопрос в рамках диалога в сервис поиска.
+    Args:
+        query: Объект ChatQuery с вопросом и идентификатором диалога.
+    Returns:
+        ChatApiResponse: Ответ сервиса поиска и идентификатор диалога. Отказы сервиса
+                         поиска (503, 504) передаются клиенту без изменений, при истекшем
+                         крайнем сроке возвращается 504.
+    Exception:
+        HTTPException: Если запрос к сервису поиска завершается с ошибкой.
+    """
+    response = call_query_service(
+        "/chat/", {"query": query.query, "session_id": query.session_id}, ChatApiResponse,
     )
-    response.raise_for_status()
-    res = response.json()["message"]
-    return ApiResponse(status="success", message=res)
+    if isinstance(response, JSONResponse):
+        return response
+    return ChatApiResponse(**response)
@@ -0,0 +1,60 @@
+import threading
+import time
+import pytest
+from query_service.utils.admission import AdmissionController, DeadlineExceeded, Overloaded
+
+
+@pytest.mark.unit
+def test_admission_queue_limit():
+    """
+    Тестирует, что сверх max_concurrency запросы ждут в очереди, а при заполненной
+    очереди сразу отклоняются с рекомендацией повторить позже.
+    """
+    admission = AdmissionController(max_concurrency=1, max_queue=1)
+    release = threading.Event()
+    order = []
+
+    def worker(name):
+        with admission.slot():
+            order.append(name)
+            release.wait(5)
+
+    first = threading.Thread(target=worker, args=("first",))
+    first.start()
+    while admission.active == 0:
+        time.sleep(0.001)
+    second = threading.Thread(target=worker, args=("second",))
+    second.start()
+    while admission.waiting == 0:
+        time.sleep(0.001)
+
+    with pytest.raises(Overloaded) as error:
+        with admission.slot():
+            pass
+    assert error.value.retry_after >= 1
+
+    release.set()
+    first.join()
+    second.join()
+    assert order == ["first", "second"]
+    assert admission.active == 0 and admission.waiting == 0
+
+
+@pytest.mark.unit
+def test_admission_deadline():
+    """
+    Тестирует удаление из очереди запросов с истекшим крайним сроком.
+    """
+    admission = AdmissionController(max_concurrency=1, max_queue=4)
+    with pytest.raises(DeadlineExceeded):
+        with admission.slot(deadline=time.time() - 1):
+            pass
+    with admission.slot():
+        start = time.time()
+        with pytest.raises(DeadlineExceeded):
+            with admission.slot(deadline=time.time() + 0.05):
+                pass
+        assert time.time() - start < 1
+    assert admission.waiting == 0
+    with admission.slot(deadline=time.time() + 1):
+        assert admission.active == 1
@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+import pytest
+import requests
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from common.metrics import DEADLINE_HEADER
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import backend  # noqa: E402
+sys.path.pop(0)
+
+
+@pytest.fixture
+def client():
+    return TestClient(backend.app)
+
+
+@pytest.mark.unit
+@patch("backend.requests.post")
+def test_query_service_timeout(mock_post, client):
+    """
+    Тестирует, что бэкенд ждет сервис поиска не дольше REQUEST_TIMEOUT и
+    возвращает 504 вместо внутренней ошибки.
+    """
+    mock_post.side_effect = requests.exceptions.Timeout("read timed out")
+    with patch.dict(os.environ, {"REQUEST_TIMEOUT": "0.5"}):
+        response = client.post("/search/", json={"query": "вопрос"})
+    assert response.status_code == 504
+    assert response.json()["status"] == "error"
+    assert 0 < mock_post.call_args.kwargs["timeout"] <= 0.5
+    assert DEADLINE_HEADER in mock_post.call_args.kwargs["headers"]
+
+
+@pytest.mark.unit
+@patch("backend.requests.post")
+def test_expired_client_deadline(mock_post, client):
+    """
+    Тестирует, что запрос с истекшим крайним сроком клиента сразу получает 504,
+    не обращаясь к сервису поиска.
+    """
+    headers = {DEADLINE_HEADER: str(time.time() - 5)}
+    response = client.post("/search/batch", json={"queries": ["вопрос"]}, headers=headers)
+    assert response.status_code == 504
+    assert response.json()["results"] == []
+    response = client.post("/chat/", json={"query": "вопрос"}, headers=headers)
+    assert response.status_code == 504
+    assert "session_id" in response.json()
+    mock_post.assert_not_called()
@@ -0,0 +1,50 @@
+import pytest
+from benchmarks.corpus import generate_corpus
+from benchmarks.micro import compare, measure
+
+
+@pytest.mark.unit
+def test_generate_corpus():
+    """
+    Тестирует формат и воспроизводимость синтетического корпуса.
+    """
+    corpus = generate_corpus(50, seed=1)
+    assert len(corpus) == 50
+    assert [item["uid"] for item in corpus] == list(range(50))
+    assert all(item["text"] and item["ru_wiki_pageid"] for item in corpus)
+    assert len({item["ru_wiki_pageid"] for item in corpus}) < 50
+    assert corpus == generate_corpus(50, seed=1)
+    assert corpus != generate_corpus(50, seed=2)
+
+
+@pytest.mark.unit
+def test_measure():
+    """
+    Тестирует количество вызовов и поля статистики.
+    """
+    calls = []
+    stats = measure(lambda: calls.append(1), repeat=3, warmup=2, items=10)
+    assert len(calls) == 5
+    assert stats["repeat"] == 3
+    assert stats["min_s"] <= stats["median_s"] <= stats["p95_s"]
+    assert stats["items"] == 10
+
+
+@pytest.mark.unit
+def test_compare():
+    """
+    Тестирует классификацию результатов относительно baseline.
+    """
+    baseline = {
+        "slow": {"median_s": 1.0},
+        "fast": {"median_s": 1.0},
+        "same": {"median_s": 1.0},
+    }
+    results = {
+        "slow": {"median_s": 1.5},
+        "fast": {"median_s": 0.5},
+        "same": {"median_s": 1.1},
+        "added": {"median_s": 0.1},
+    }
+    statuses = {row["name"]: row["status"] for row in compare(results, baseline, tolerance=0.2)}
+    assert statuses == {"slow": "regression", "fast": "improvement", "same": "ok", "added": "new"}
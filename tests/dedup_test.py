@@ -0,0 +1,63 @@
+import pytest
+from indexing_service.utils.dedup import deduplicate, dedup_report, lsh_params, shingles
+
+BASE_TEXT = (
+    "ЦСКА — советский и российский профессиональный хоккейный клуб из Москвы, выступающий "
+    "в Континентальной хоккейной лиге. Основан в 1946 году под названием ЦДКА (Центральный дом "
+    "Красной Армии). В 1951 году переименован в ЦДСА, а в 1954 в ЦСК МО, под которым выступал "
+    "до 1959 года, и с тех пор носит название ЦСКА."
+)
+OTHER_TEXT = (
+    "Волга — река в европейской части России, одна из крупнейших рек на Земле и самая длинная "
+    "в Европе. Исток реки находится на Валдайской возвышенности, впадает в Каспийское море."
+)
+
+
+@pytest.mark.unit
+def test_shingles():
+    """
+    Тестирует построение словных шинглов.
+    """
+    assert shingles("Раз два три", size=5) == ["раз два три".encode("utf-8")]
+    assert len(shingles("a b c d e f g", size=5)) == 3
+
+
+@pytest.mark.unit
+def test_lsh_params():
+    """
+    Тестирует подбор полос LSH.
+    """
+    bands, rows = lsh_params(0.9, 128)
+    assert bands * rows == 128
+    assert abs((1 / bands) ** (1 / rows) - 0.9) < 0.1
+
+
+@pytest.mark.unit
+def test_deduplicate():
+    """
+    Тестирует удаление почти одинаковых чанков и запись страниц дубликатов в представителя.
+    """
+    data = [
+        {"uid": 0, "ru_wiki_pageid": 1, "text": BASE_TEXT},
+        {"uid": 1, "ru_wiki_pageid": 2, "text": OTHER_TEXT},
+        {"uid": 2, "ru_wiki_pageid": 3, "text": BASE_TEXT.replace("1946", "1947")},
+        {"uid": 3, "ru_wiki_pageid": 4, "text": BASE_TEXT},
+    ]
+    result = deduplicate(data, threshold=0.7)
+    assert [item["uid"] for item in result] == [0, 1]
+    assert result[0]["alt_pageids"] == [3, 4]
+    assert "alt_pageids" not in result[1]
+
+
+@pytest.mark.unit
+def test_dedup_report():
+    """
+    Тестирует отчет об удаленных чанках по порогам.
+    """
+    data = [
+        {"ru_wiki_pageid": 1, "text": BASE_TEXT},
+        {"ru_wiki_pageid": 2, "text": BASE_TEXT},
+        {"ru_wiki_pageid": 3, "text": OTHER_TEXT},
+    ]
+    assert dedup_report(data, thresholds=(0.5, 0.99)) == {0.5: 1, 0.99: 1}
+    assert deduplicate([]) == []
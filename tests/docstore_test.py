@@ -0,0 +1,57 @@
+import os
+import pytest
+from indexing_service.utils.docstore import DocStore, SEGMENT_FILE
+
+
+@pytest.mark.unit
+def test_put_and_get(tmp_path):
+    """
+    Тестирует запись и чтение текстов, включая отсутствующие идентификаторы.
+    """
+    store = DocStore(str(tmp_path))
+    texts = ["ЦСКА — советский и российский клуб.", "Волга — река в Европе. " * 50, ""]
+    assert store.put_many(enumerate(texts)) == 3
+    assert len(store) == 3
+    assert store.get_many([2, 0, 1, 99]) == [texts[2], texts[0], texts[1], None]
+    assert store.next_id == 3
+    assert os.path.getsize(tmp_path / SEGMENT_FILE) < len(texts[1].encode("utf-8"))
+
+
+@pytest.mark.unit
+def test_overwrite_and_reopen(tmp_path):
+    """
+    Тестирует перезапись текста с тем же идентификатором и сохранность после переоткрытия.
+    """
+    store = DocStore(str(tmp_path))
+    store.put_many([(5, "старый текст")])
+    store.put_many([(5, "новый текст"), (6, "другой текст")])
+    assert store.get(5) == "новый текст"
+    reopened = DocStore(str(tmp_path))
+    assert reopened.get_many([5, 6]) == ["новый текст", "другой текст"]
+
+
+@pytest.mark.unit
+def test_reads_records_written_by_other_instance(tmp_path):
+    """
+    Тестирует, что читатель видит записи, добавленные другим экземпляром (процессом).
+    """
+    reader = DocStore(str(tmp_path))
+    writer = DocStore(str(tmp_path))
+    assert reader.get(1) is None
+    writer.put_many([(1, "первый")])
+    assert reader.get(1) == "первый"
+    writer.put_many([(2, "второй " * 1000)])
+    assert reader.get(2) == "второй " * 1000
+
+
+@pytest.mark.unit
+def test_append_assigns_new_ids(tmp_path):
+    """
+    Тестирует выдачу новых идентификаторов, не пересекающихся с записями другого экземпляра.
+    """
+    first = DocStore(str(tmp_path))
+    second = DocStore(str(tmp_path))
+    assert first.append(["а", "б"]) == [0, 1]
+    assert second.append(["в"]) == [2]
+    assert first.append(["г"]) == [3]
+    assert first.get_many([0, 1, 2, 3]) == ["а", "б", "в", "г"]
@@ -1,6 +1,10 @@
+import gzip
+import json
+import threading
+import time
 import pytest
 from unittest.mock import patch
-from indexing_service.utils.downloader import load_json_from_url
+from indexing_service.utils.downloader import load_json_from_url, load_source, load_sources
 import requests
 
 
@@ -67,3 +71,82 @@ def test_load_json_from_url_invalid_json(mock_get):
     result = load_json_from_url(test_url)
     mock_get.assert_called_once_with(test_url, timeout=10)
     assert result == []
+
+
+@pytest.mark.unit
+def test_load_source_local_formats(tmp_path, monkeypatch):
+    """Тестирует чтение локальных файлов JSON, JSONL, gzip и Parquet"""
+    pq = pytest.importorskip("pyarrow.parquet")
+    import pyarrow as pa
+    records = [{"ru_wiki_pageid": 1, "text": "Пример текста 1"}, {"ru_wiki_pageid": 2, "text": "Пример текста 2"}]
+    (tmp_path / "data.json").write_text(json.dumps(records), encoding="utf-8")
+    (tmp_path / "data.jsonl").write_text("\n".join(json.dumps(r) for r in records) + "\n", encoding="utf-8")
+    with gzip.open(tmp_path / "data.jsonl.gz", "wt", encoding="utf-8") as f:
+        f.write("\n".join(json.dumps(r) for r in records))
+    pq.write_table(pa.Table.from_pylist(records), tmp_path / "data.parquet")
+    monkeypatch.setenv("INGEST_ROOT", str(tmp_path))
+    for name in ("data.json", "data.jsonl", "data.jsonl.gz", "data.parquet"):
+        assert load_source(str(tmp_path / name)) == records
+    assert load_source("data.jsonl") == records
+    assert load_source(f"file://{tmp_path / 'data.json'}") == records
+    (tmp_path / "object.json").write_text('{"text": "не список"}', encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_source(str(tmp_path / "object.json"))
+
+
+@pytest.mark.unit
+def test_load_sources_statuses(tmp_path, monkeypatch):
+    """Тестирует объединение записей в порядке источников и статус каждого источника"""
+    monkeypatch.setenv("INGEST_ROOT", str(tmp_path))
+    (tmp_path / "a.json").write_text(json.dumps([{"text": "a"}]), encoding="utf-8")
+    (tmp_path / "b.json").write_text(json.dumps([{"text": "b1"}, {"text": "b2"}]), encoding="utf-8")
+    sources = [str(tmp_path / "a.json"), str(tmp_path / "missing.json"), str(tmp_path / "b.json")]
+    records, statuses = load_sources(sources, parallelism=2)
+    assert [r["text"] for r in records] == ["a", "b1", "b2"]
+    assert [s["status"] for s in statuses] == ["success", "error", "success"]
+    assert [s["records"] for s in statuses] == [1, 0, 2]
+    assert statuses[1]["error"]
+
+
+@pytest.mark.unit
+@patch("indexing_service.utils.downloader.load_source")
+def test_load_sources_parallel(mock_load_source):
+    """Тестирует, что источники загружаются параллельно с ограничением parallelism"""
+    lock = threading.Lock()
+    active, peak, expected = [0], [0], [0]
+
+    def counting_source(source):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        # Ждет, пока параллельно не начнется столько загрузок, сколько разрешено.
+        deadline = time.monotonic() + 5
+        while peak[0] < expected[0] and time.monotonic() < deadline:
+            time.sleep(0.001)
+        with lock:
+            active[0] -= 1
+        return [{"text": source}]
+
+    mock_load_source.side_effect = counting_source
+    sources = [f"http://example.com/{i}.json" for i in range(6)]
+    for parallelism in (4, 2):
+        expected[0], peak[0] = parallelism, 0
+        records, _ = load_sources(sources, parallelism=parallelism)
+        assert peak[0] == parallelism
+        assert [r["text"] for r in records] == sources
+
+
+@pytest.mark.unit
+def test_load_source_outside_root(tmp_path, monkeypatch):
+    """Тестирует отказ читать файлы вне INGEST_ROOT, в том числе через .. и ссылки"""
+    root = tmp_path / "data"
+    root.mkdir()
+    secret = tmp_path / "secret.json"
+    secret.write_text(json.dumps([{"text": "секрет"}]), encoding="utf-8")
+    (root / "link.json").symlink_to(secret)
+    monkeypatch.setenv("INGEST_ROOT", str(root))
+    for source in (str(secret), "../secret.json", str(root / "link.json"), f"file://{secret}"):
+        with pytest.raises(PermissionError):
+            load_source(source)
+    records, statuses = load_sources([str(secret)])
+    assert records == [] and statuses[0]["status"] == "error"
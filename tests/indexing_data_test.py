@@ -0,0 +1,120 @@
+import os
+import sys
+import pytest
+from unittest.mock import MagicMock, patch
+from qdrant_client import QdrantClient
+from qdrant_client.models import CollectionStatus
+
+
+@pytest.fixture(scope="module")
+def indexing_data(tmp_path_factory):
+    """
+    Модуль indexing_data с крошечной моделью эмбеддингов. Модуль импортирует свои
+    зависимости как `utils.*`, как в контейнере сервиса индексации.
+    """
+    from benchmarks.tiny_models import build_tiny_model
+
+    workdir = tmp_path_factory.mktemp("indexing")
+    with patch.dict(os.environ, {
+        "EMB_MODEL": build_tiny_model(str(workdir / "model")),
+        "EMB_SIZE": "64",
+        "DOCSTORE_PATH": str(workdir / "docstore"),
+        "COLLECT_NAME": "test_collection",
+    }):
+        sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "indexing_service"))
+        try:
+            from utils import indexing_data
+        finally:
+            sys.path.pop(0)
+        yield indexing_data
+
+
+@pytest.fixture
+def client(indexing_data):
+    """
+    Локальный клиент Qdrant в памяти вместо сервера.
+    """
+    indexing_data.client = QdrantClient(":memory:")
+    yield indexing_data.client
+    indexing_data.client.close()
+
+
+def chunks(prefix, count=3):
+    return [{"ru_wiki_pageid": i, "text": f"{prefix} текст номер {i}"} for i in range(count)]
+
+
+@pytest.mark.unit
+def test_rebuild_drops_old_docstores(indexing_data, client):
+    """
+    Тестирует, что тексты удаленной версии коллекции удаляются вместе с ней, а при
+    переходе с обычной коллекции на алиас удаляется и общее хранилище текстов.
+    """
+    with patch.dict(os.environ, {"REINDEX_KEEP_VERSIONS": "0"}):
+        indexing_data.index_data(chunks("старый"))
+        assert len(indexing_data.docstore) == 3
+        first = indexing_data.rebuild_index(chunks("первый"))
+        assert len(indexing_data.docstore) == 0
+        assert os.path.isdir(os.path.join(indexing_data.docstore_root, first))
+        second = indexing_data.rebuild_index(chunks("второй"))
+    assert not os.path.exists(os.path.join(indexing_data.docstore_root, first))
+    assert [c.name for c in client.get_collections().collections] == [second]
+    assert indexing_data.search_data("второй текст").startswith("второй")
+    indexing_data.index_data(chunks("новый", 1))
+    assert len(indexing_data._docstore(second)) == 4
+
+
+@pytest.mark.unit
+def test_failed_rebuild_drops_docstore(indexing_data, client):
+    """
+    Тестирует удаление коллекции и текстов версии, если переиндексация не удалась.
+    """
+    before = set(os.listdir(indexing_data.docstore_root))
+    with patch.object(indexing_data, "_wait_until_indexed", side_effect=TimeoutError("slow")):
+        with pytest.raises(ValueError):
+            indexing_data.rebuild_index(chunks("сбой"))
+    assert client.get_collections().collections == []
+    assert set(os.listdir(indexing_data.docstore_root)) == before
+
+
+@pytest.mark.unit
+def test_rebuild_keeps_alias_on_empty_data(indexing_data, client):
+    """
+    Тестирует, что пустые или сильно урезанные данные не заменяют текущую версию.
+    """
+    current = indexing_data.rebuild_index(chunks("текущий", 4))
+    with pytest.raises(ValueError):
+        indexing_data.rebuild_index([])
+    with pytest.raises(ValueError):
+        indexing_data.rebuild_index(chunks("урезанный", 1))
+    assert indexing_data._alias_target(indexing_data.collection_name) == current
+    assert [c.name for c in client.get_collections().collections] == [current]
+    assert indexing_data.search_data("текущий текст").startswith("текущий")
+
+
+@pytest.mark.unit
+def test_wait_until_indexed(indexing_data):
+    """
+    Тестирует, что статус green до начала работы оптимизатора не считается
+    построенным индексом.
+    """
+    def info(status, indexed=0):
+        return MagicMock(status=status, indexed_vectors_count=indexed)
+
+    mock_client = MagicMock()
+    with patch.object(indexing_data, "client", mock_client), patch.object(indexing_data.time, "sleep"):
+        mock_client.get_collection.side_effect = [
+            info(CollectionStatus.GREEN), info(CollectionStatus.YELLOW), info(CollectionStatus.GREEN),
+        ]
+        indexing_data._wait_until_indexed("c", count=100000, threshold_kb=1)
+        assert mock_client.get_collection.call_count == 3
+
+        mock_client.get_collection.reset_mock()
+        mock_client.get_collection.side_effect = [
+            info(CollectionStatus.GREEN), info(CollectionStatus.GREEN, indexed=100000),
+        ]
+        indexing_data._wait_until_indexed("c", count=100000, threshold_kb=1)
+        assert mock_client.get_collection.call_count == 2
+
+        mock_client.get_collection.reset_mock()
+        mock_client.get_collection.side_effect = [info(CollectionStatus.GREEN)]
+        indexing_data._wait_until_indexed("c", count=10, threshold_kb=20000)
@@ -0,0 +1,57 @@
+import pytest
+from fastapi.testclient import TestClient
+from benchmarks.loadgen import parse_mix, percentile, summarize
+from benchmarks.stub_services import create_stub_app
+
+
+@pytest.mark.unit
+def test_percentile():
+    """
+    Тестирует перцентили методом ближайшего ранга.
+    """
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([], 50) == 0.0
+
+
+@pytest.mark.unit
+def test_parse_mix():
+    """
+    Тестирует разбор и нормировку смеси запросов.
+    """
+    assert parse_mix(["search=3", "indexing=1"]) == {"search": 0.75, "indexing": 0.25}
+    with pytest.raises(ValueError):
+        parse_mix(["unknown=1"])
+
+
+@pytest.mark.unit
+def test_summarize():
+    """
+    Тестирует подсчет пропускной способности и ошибок.
+    """
+    samples = [
+        ("search", 0.1, True, ""),
+        ("search", 0.2, True, ""),
+        ("indexing", 0.0, False, "HTTP 500"),
+    ]
+    report = summarize(samples, duration=1.0)
+    assert report["requests"] == 3
+    assert report["throughput_rps"] == 2.0
+    assert report["error_rate"] == round(1 / 3, 4)
+    assert report["errors"] == {"HTTP 500": 1}
+    assert report["endpoints"]["search"]["p99_ms"] == 200.0
+    assert report["endpoints"]["indexing"]["error_rate"] == 1.0
+
+
+@pytest.mark.unit
+def test_stub_services():
+    """
+    Тестирует ответы заглушек сервисов.
+    """
+    query = TestClient(create_stub_app("query"))
+    assert query.post("/search/", json={"query": "вопрос"}).json()["status"] == "success"
+    assert query.post("/indexing/", json={"url": "u"}).status_code == 404
+    indexing = TestClient(create_stub_app("indexing", error_rate=1.0))
+    assert indexing.post("/indexing/", json={"url": "u"}).status_code == 500
@@ -0,0 +1,74 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from common.metrics import (
+    DEADLINE_HEADER,
+    REQUEST_ID_HEADER,
+    get_request_id,
+    request_headers,
+    setup_metrics,
+    stage_timer,
+)
+
+
+@pytest.fixture
+def client():
+    """
+    Приложение с подключенными метриками и endpoint, возвращающим заголовки
+    для запроса к следующему сервису.
+    """
+    app = FastAPI()
+    setup_metrics(app)
+
+    @app.get("/echo/")
+    def echo():
+        with stage_timer("test_stage"):
+            return {"request_id": get_request_id(), "headers": request_headers()}
+
+    return TestClient(app)
+
+
+@pytest.mark.unit
+def test_request_id_propagation(client):
+    """
+    Тестирует, что входящий X-Request-ID доступен обработчику, передается дальше
+    и возвращается в ответе.
+    """
+    response = client.get("/echo/", headers={REQUEST_ID_HEADER: "abc123"})
+    body = response.json()
+    assert body["request_id"] == "abc123"
+    assert body["headers"][REQUEST_ID_HEADER] == "abc123"
+    assert response.headers[REQUEST_ID_HEADER] == "abc123"
+
+
+@pytest.mark.unit
+def test_request_id_generated(client):
+    """
+    Тестирует создание идентификатора, если клиент его не передал.
+    """
+    response = client.get("/echo/")
+    assert response.json()["request_id"]
+    assert response.headers[REQUEST_ID_HEADER] == response.json()["request_id"]
+    assert get_request_id() == ""
+
+
+@pytest.mark.unit
+def test_deadline_propagation(client):
+    """
+    Тестирует передачу крайнего срока запроса следующему сервису.
+    """
+    response = client.get("/echo/", headers={DEADLINE_HEADER: "1700000000.5"})
+    assert response.json()["headers"][DEADLINE_HEADER] == "1700000000.500"
+    response = client.get("/echo/", headers={DEADLINE_HEADER: "soon"})
+    assert DEADLINE_HEADER not in response.json()["headers"]
+
+
+@pytest.mark.unit
+def test_metrics_endpoint(client):
+    """
+    Тестирует публикацию метрик этапов и HTTP-запросов.
+    """
+    client.get("/echo/")
+    text = client.get("/metrics").text
+    assert 'rag_stage_duration_seconds_count{stage="test_stage"}' in text
+    assert 'rag_http_request_duration_seconds_count{method="GET",path="/echo/",status="200"}' in text
@@ -0,0 +1,40 @@
+import pytest
+from unittest.mock import patch
+from common import prefork
+from common.prefork import threads_per_worker, import_app
+
+
+@pytest.mark.unit
+def test_threads_per_worker():
+    """
+    Тестирует распределение потоков torch между воркерами.
+    """
+    assert threads_per_worker(1, cpu_count=8) == 8
+    assert threads_per_worker(4, cpu_count=8) == 2
+    assert threads_per_worker(3, cpu_count=8) == 2
+    assert threads_per_worker(16, cpu_count=8) == 1
+    assert threads_per_worker(0, cpu_count=8) == 8
+
+
+@pytest.mark.unit
+def test_import_app():
+    """
+    Тестирует импорт приложения по строке "module:attribute".
+    """
+    assert import_app("common.prefork:serve").__name__ == "serve"
+    with pytest.raises(ValueError):
+        import_app("common.prefork")
+    with pytest.raises(ValueError):
+        import_app("common.prefork:missing")
+
+
+@pytest.mark.unit
+def test_worker_exit_code():
+    """
+    Тестирует, что упавший воркер завершается с ненулевым кодом, а штатно
+    остановленный - с нулевым.
+    """
+    with patch.object(prefork, "_run_worker", side_effect=RuntimeError("boom")):
+        assert prefork._worker_exit_code(0, None, None, 1) == 1
+    with patch.object(prefork, "_run_worker"):
+        assert prefork._worker_exit_code(0, None, None, 1) == 0
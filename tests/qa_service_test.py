@@ -1,5 +1,6 @@
 import pytest
 from unittest.mock import patch, MagicMock
+from prometheus_client import REGISTRY
 from query_service.utils.local_llm import CustomQueryLLM
 
 
@@ -55,3 +56,36 @@ def test_prompt_generation(mock_model, mock_tokenizer):
     assert messages[1]['role'] == 'user'
     assert messages[1]['content'] == user_query
     assert response == "Mocked LLM response"
+
+
+@pytest.mark.unit
+def test_generate_batch(mock_model, mock_tokenizer):
+    """
+    Тест пакетной генерации: ответы отделяются от промптов и возвращаются по порядку
+    """
+    import torch
+    from transformers import BatchEncoding
+    llm = CustomQueryLLM(
+        model_name="test-model",
+        system_prompt="Информация: {text}",
+        torch_dtype="FLOAT16",
+        max_new_tokens=2,
+    )
+    mock_tokenizer.pad_token_id = 0
+    mock_tokenizer.eos_token_id = 0
+    mock_tokenizer.return_value = BatchEncoding({
+        "input_ids": torch.tensor([[0, 5, 6], [7, 8, 9]]),
+        "attention_mask": torch.tensor([[0, 1, 1], [1, 1, 1]]),
+    })
+    mock_model.generate.return_value = torch.tensor([[0, 5, 6, 11, 0], [7, 8, 9, 12, 13]])
+    mock_tokenizer.batch_decode.side_effect = lambda ids, **kwargs: [str(row.tolist()) for row in ids]
+    tokens = REGISTRY.get_sample_value("rag_generated_tokens_total") or 0.0
+    responses = llm.generate_batch(["контекст 1", "контекст 2"], ["вопрос 1", "вопрос 2"])
+
+    args, kwargs = mock_tokenizer.call_args
+    assert kwargs["padding_side"] == "left"
+    assert len(args[0]) == 2
+    assert mock_model.generate.call_args.kwargs["max_new_tokens"] == 2
+    assert responses == ["[11, 0]", "[12, 13]"]
+    # EOS (совпадает с pad) считается, как в generate: по 2 токена в каждой строке.
+    assert REGISTRY.get_sample_value("rag_generated_tokens_total") == tokens + 4
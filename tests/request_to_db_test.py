@@ -0,0 +1,34 @@
+import time
+import pytest
+import requests
+from unittest.mock import patch
+from common.metrics import deadline_var
+from query_service.utils.admission import DeadlineExceeded
+from query_service.utils.request_to_db import request_in_base, request_in_base_batch
+
+
+@pytest.mark.unit
+@patch("query_service.utils.request_to_db.requests.post")
+def test_retrieval_deadline(mock_post):
+    """
+    Тестирует, что запрос с истекшим крайним сроком не отправляется в сервис
+    индексации, а таймаут сервиса индексации считается истекшим крайним сроком.
+    """
+    token = deadline_var.set(time.time() - 1)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            request_in_base("вопрос")
+        with pytest.raises(DeadlineExceeded):
+            request_in_base_batch(["вопрос"])
+        mock_post.assert_not_called()
+    finally:
+        deadline_var.reset(token)
+
+    mock_post.side_effect = requests.exceptions.Timeout("read timed out")
+    token = deadline_var.set(time.time() + 5)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            request_in_base("вопрос")
+        assert 0 < mock_post.call_args.kwargs["timeout"] <= 5
+    finally:
+        deadline_var.reset(token)
@@ -0,0 +1,112 @@
+import time
+import pytest
+import torch
+from unittest.mock import patch
+from transformers import DynamicCache
+from query_service.utils.sessions import Session, SessionStore, cache_nbytes, common_prefix_length
+
+
+def make_session(session_id, tokens):
+    """
+    Создает сессию с кэшем одного слоя на tokens токенов (по 64 байта на key и value).
+    """
+    session = Session(session_id)
+    cache = DynamicCache()
+    cache.update(torch.zeros(1, 1, tokens, 16), torch.zeros(1, 1, tokens, 16), 0)
+    session.cache = cache
+    return session
+
+
+@pytest.mark.unit
+def test_cache_nbytes():
+    """
+    Тестирует подсчет памяти кэша и длины общего начала токенов.
+    """
+    assert cache_nbytes(make_session("a", 10).cache) == 2 * 10 * 16 * 4
+    assert cache_nbytes(None) == 0
+    assert common_prefix_length([1, 2, 3, 4], [1, 2, 5]) == 2
+
+
+@pytest.mark.unit
+def test_session_store_lru_eviction():
+    """
+    Тестирует вытеснение давно неиспользуемых сессий при превышении бюджета памяти.
+    """
+    store = SessionStore(max_bytes=3 * 1280, ttl=60)
+    for session_id in ("a", "b", "c"):
+        store.put(make_session(session_id, 10))
+    assert store.get("a").cache is not None
+    store.put(make_session("d", 10))
+    assert "b" not in store
+    assert {"a", "c", "d"} <= set(store._sessions)
+    assert store.nbytes == 3 * 1280
+    assert store.get("b").messages == []
+
+
+@pytest.mark.unit
+def test_session_store_ttl():
+    """
+    Тестирует удаление сессий, к которым долго не обращались.
+    """
+    store = SessionStore(max_bytes=10 ** 6, ttl=60)
+    store.put(make_session("old", 10))
+    store._sessions["old"].last_used = time.time() - 120
+    assert store.get("old").cache is None
+    assert len(store) == 0 and store.nbytes == 0
+
+
+@pytest.fixture(scope="module")
+def llm(tmp_path_factory):
+    """
+    CustomQueryLLM с крошечной моделью со случайными весами.
+    """
+    from benchmarks.tiny_models import build_tiny_model
+    from query_service.utils.local_llm import CustomQueryLLM
+
+    return CustomQueryLLM(
+        build_tiny_model(str(tmp_path_factory.mktemp("chat") / "model")),
+        system_prompt="Информация из базы: {text}",
+        torch_dtype="FLOAT32",
+        max_new_tokens=4,
+    )
+
+
+@pytest.mark.unit
+def test_chat_reuses_cache(llm):
+    """
+    Тестирует, что следующий ход диалога переиспользует кэш и дает тот же ответ,
+    что и генерация с полным prefill.
+    """
+    from prometheus_client import REGISTRY
+
+    session = Session("chat")
+    llm.chat(session, text="Москва - столица России. " * 10, prompt="Где столица?")
+    history = list(session.messages)
+    cached_length = session.cache.get_seq_length()
+    hits = REGISTRY.get_sample_value("rag_cache_hits_total", {"cache": "session"}) or 0.0
+    cached = llm.chat(session, text="Волга впадает в Каспийское море.", prompt="А Волга?")
+
+    fresh = Session("fresh")
+    fresh.messages = history
+    assert llm.chat(fresh, text="Волга впадает в Каспийское море.", prompt="А Волга?") == cached
+    assert REGISTRY.get_sample_value("rag_cache_hits_total", {"cache": "session"}) == hits + 1
+    assert session.cache.get_seq_length() > cached_length
+    assert len(session.messages) == 5
+
+
+@pytest.mark.unit
+def test_chat_failure_resets_cache(llm):
+    """
+    Тестирует, что после ошибки генерации в сессии не остается кэш, измененный
+    неудавшимся ходом, а история диалога не меняется.
+    """
+    session = Session("failed")
+    llm.chat(session, text="Москва - столица России.", prompt="Где столица?")
+    history = list(session.messages)
+    with patch.object(llm.model, "generate", side_effect=RuntimeError("out of memory")):
+        with pytest.raises(RuntimeError):
+            llm.chat(session, text="Волга впадает в Каспийское море.", prompt="А Волга?")
+    assert session.cache is None and session.token_ids == []
+    assert session.messages == history
+    llm.chat(session, text="Волга впадает в Каспийское море.", prompt="А Волга?")
+    assert len(session.messages) == 5